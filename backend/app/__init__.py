@@ -1,4 +1,4 @@
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify
 import os
 from app.config import Config
 from flask_sqlalchemy import SQLAlchemy
@@ -23,20 +23,34 @@ def create_app():
     db.init_app(app)
     migrate.init_app(app, db)
 
-    @app.before_request
-    def log_request():
-        print("\n📥 --- Incoming Request ---")
-        print("Method:", request.method)
-        print("URL:", request.url)
-        print("Headers:", dict(request.headers))
-        print("Query Params:", request.args.to_dict())
-        print("Body (JSON):", request.get_json(silent=True))
-        print("--- End Request Log ---\n")
+    from app.utils.json_provider import init_json
+    init_json(app)
+
+    from app.utils.metrics import init_metrics
+    init_metrics(app, db)
+
+    from app.utils.nplus1 import init_nplus1_detector
+    init_nplus1_detector(app, db)
+
+    from app.utils.request_log import init_request_logging
+    init_request_logging(app)
 
 
     with app.app_context():
         register_blueprints(app)
 
+    from app.cli import register_cli
+    register_cli(app)
+
+    from app.services.trip_point_writer import init_trip_point_writer
+    init_trip_point_writer(app)
+
+    from app.services.password_hasher import init_password_hasher
+    init_password_hasher(app)
+
+    from app.utils.profiler import init_profiler
+    init_profiler(app, db)
+
     @app.route('/')
     def index(): return jsonify({'message':'Welcome to Hackathon API'})
 
@@ -0,0 +1,122 @@
+# app/cli.py
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import func
+
+from app.models import RouteCluster, RouteClusterBand, Trip, TripPoint, db
+from app.utils.route_signature import cells_to_bytes, signature_digest
+
+route_cluster_cli = AppGroup("route-cluster", help="Route clustering maintenance.")
+trip_cli = AppGroup("trip", help="Trip data maintenance.")
+profile_cli = AppGroup("profile", help="Per-request profiling.")
+
+
+@route_cluster_cli.command("backfill-minhash")
+@click.option("--batch-size", default=500, show_default=True)
+@click.option("--rebuild", is_flag=True, help="Recompute sketches that already exist (e.g. after changing MINHASH_NUM_PERM/LSH_BANDS).")
+def backfill_minhash(batch_size, rebuild):
+    """Store MinHash sketches + LSH buckets for clusters that lack them."""
+    from app.services.route_cluster_service import RouteClusterService
+
+    last_id, done = 0, 0
+    while True:
+        q = RouteCluster.query.filter(RouteCluster.id > last_id)
+        if not rebuild:
+            q = q.filter(RouteCluster.minhash.is_(None))
+        rows = q.order_by(RouteCluster.id.asc()).limit(batch_size).all()
+        if not rows:
+            break
+        for c in rows:
+            RouteClusterBand.query.filter_by(cluster_id=c.id).delete(synchronize_session=False)
+            c.minhash, keys = RouteClusterService.sketch_of(c.signature_cells())
+            c.bands = [RouteClusterBand(band=i, bucket=k) for i, k in enumerate(keys)]
+        db.session.commit()
+        last_id = rows[-1].id
+        done += len(rows)
+        click.echo(f"{done} clusters sketched")
+    click.echo("done")
+
+
+@route_cluster_cli.command("migrate-signatures")
+@click.option("--batch-size", default=500, show_default=True)
+@click.option("--drop-json", is_flag=True, help="Clear geohashes_json once geohashes_bin is written.")
+def migrate_signatures(batch_size, drop_json):
+    """Convert geohashes_json signatures into the binary geohashes_bin column (+ sig_digest)."""
+    last_id, done = 0, 0
+    while True:
+        q = RouteCluster.query.filter(RouteCluster.id > last_id)
+        if drop_json:
+            q = q.filter(RouteCluster.geohashes_json.isnot(None))
+        else:
+            q = q.filter((RouteCluster.geohashes_bin.is_(None)) | (RouteCluster.sig_digest.is_(None)))
+        rows = q.order_by(RouteCluster.id.asc()).limit(batch_size).all()
+        if not rows:
+            break
+        for c in rows:
+            c.geohashes_bin = cells_to_bytes(c.signature_cells())
+            c.sig_digest = signature_digest(c.geohashes_bin)
+            if drop_json:
+                c.geohashes_json = None
+        db.session.commit()
+        last_id = rows[-1].id
+        done += len(rows)
+        click.echo(f"{done} clusters converted")
+    click.echo("done")
+
+
+@trip_cli.command("compact")
+@click.option("--older-than-hours", default=24.0, show_default=True)
+@click.option("--tolerance-m", type=float, default=None, help="Defaults to TRIP_COMPACT_TOLERANCE_M.")
+@click.option("--batch-size", default=200, show_default=True)
+def compact_trips(older_than_hours, tolerance_m, batch_size):
+    """Archive the raw trip_point rows of finished trips (nightly job)."""
+    from app.services.trip_point_service import TripPointService
+    from app.services.trip_service import FINISHED_STATUSES
+
+    cutoff = datetime.utcnow() - timedelta(hours=older_than_hours)
+    last_id, trips, raw, kept = 0, 0, 0, 0
+    while True:
+        # finished trips only; trips finalized before ended_at was recorded age by their last ping
+        ids = [r[0] for r in (db.session.query(TripPoint.trip_id)
+                              .join(Trip, Trip.id == TripPoint.trip_id)
+                              .filter(TripPoint.trip_id > last_id,
+                                      Trip.status.in_(FINISHED_STATUSES))
+                              .group_by(TripPoint.trip_id, Trip.ended_at)
+                              .having(func.coalesce(Trip.ended_at, func.max(TripPoint.recorded_at)) < cutoff)
+                              .order_by(TripPoint.trip_id.asc())
+                              .limit(batch_size)
+                              .all())]
+        if not ids:
+            break
+        for trip_id in ids:
+            before = db.session.query(func.count()).filter(TripPoint.trip_id == trip_id).scalar()
+            archive = TripPointService.compact_path(trip_id, tolerance_m)
+            if archive is not None:
+                trips += 1
+                raw += before
+                kept += archive.kept_points
+        last_id = ids[-1]
+        click.echo(f"{trips} trips compacted, {raw} rows -> {kept} points")
+    click.echo("done")
+
+
+@profile_cli.command("sign")
+@click.argument("method")
+@click.argument("path")
+def sign_profile(method, path):
+    """Print an X-Profile header value for METHOD PATH (no query string)."""
+    from app.utils.profiler import sign_profile_request
+
+    secret = current_app.config.get("PROFILE_SECRET")
+    if not secret:
+        raise click.ClickException("PROFILE_SECRET is not set")
+    click.echo(f"X-Profile: {sign_profile_request(secret, method.upper(), path)}")
+
+
+def register_cli(app):
+    app.cli.add_command(route_cluster_cli)
+    app.cli.add_command(trip_cli)
+    app.cli.add_command(profile_cli)
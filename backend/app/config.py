@@ -36,6 +36,94 @@ class Config(object):
 
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Route clustering
+    ROUTE_INDEX_REFRESH_SEC = float(os.getenv('ROUTE_INDEX_REFRESH_SEC', '5'))
+    ROUTE_INDEX_MAX_PAIRS = int(os.getenv('ROUTE_INDEX_MAX_PAIRS', '10000'))
+    # "exact" scans the OD pair through the in-process index; "lsh" asks the
+    # route_cluster_band table for MinHash bucket hits and re-scores only those.
+    # r = MINHASH_NUM_PERM / LSH_BANDS; the match threshold is ~(1/bands)**(1/r).
+    # Sketches/band rows are only written in lsh mode: run `flask route-cluster
+    # backfill-minhash` when switching to it.
+    ROUTE_MATCH_MODE = os.getenv('ROUTE_MATCH_MODE', 'exact')
+    MINHASH_NUM_PERM = int(os.getenv('MINHASH_NUM_PERM', '64'))
+    LSH_BANDS = int(os.getenv('LSH_BANDS', '16'))
+    # keep writing legacy geohashes_json next to geohashes_bin: workers from before the binary
+    # signatures json.loads() that column. Set it to false only once every worker runs this
+    # code and `flask route-cluster migrate-signatures --drop-json` has run.
+    ROUTE_SIG_WRITE_JSON = os.getenv('ROUTE_SIG_WRITE_JSON', 'true').lower() in ('1', 'true', 'yes')
+    CLUSTERIZE_BATCH_MAX = int(os.getenv('CLUSTERIZE_BATCH_MAX', '200'))
+
+    # Trip pings
+    TRIP_PINGS_MAX = int(os.getenv('TRIP_PINGS_MAX', '500'))
+    # "sync" commits every ping; "buffered" queues them for the write-behind flusher
+    TRIP_POINT_WRITE_MODE = os.getenv('TRIP_POINT_WRITE_MODE', 'sync')
+    TRIP_POINT_QUEUE_MAX = int(os.getenv('TRIP_POINT_QUEUE_MAX', '10000'))
+    TRIP_POINT_FLUSH_MS = int(os.getenv('TRIP_POINT_FLUSH_MS', '200'))
+    TRIP_POINT_FLUSH_ROWS = int(os.getenv('TRIP_POINT_FLUSH_ROWS', '500'))
+    # connection errors requeue a flush this many times (with backoff) before its rows are dropped
+    TRIP_POINT_FLUSH_RETRIES = int(os.getenv('TRIP_POINT_FLUSH_RETRIES', '3'))
+    # durability window: wait for the flush before answering the ping?
+    TRIP_POINT_WAIT_FLUSH = os.getenv('TRIP_POINT_WAIT_FLUSH', 'false').lower() in ('1', 'true', 'yes')
+    TRIP_POINT_WAIT_TIMEOUT = float(os.getenv('TRIP_POINT_WAIT_TIMEOUT', '5'))
+    # per-process cache of trip owner/status/cluster/risk used by the ping path
+    TRIP_STATE_TTL_SEC = float(os.getenv('TRIP_STATE_TTL_SEC', '10'))
+    TRIP_STATE_CACHE_SIZE = int(os.getenv('TRIP_STATE_CACHE_SIZE', '10000'))
+    # live deviation from the planned route_polyline
+    DEVIATION_THRESHOLD_M = float(os.getenv('DEVIATION_THRESHOLD_M', '75'))
+    DEVIATION_SUSTAIN_PINGS = int(os.getenv('DEVIATION_SUSTAIN_PINGS', '3'))
+    DEVIATION_WINDOW = int(os.getenv('DEVIATION_WINDOW', '8'))
+    TRACKER_TTL_SEC = float(os.getenv('TRACKER_TTL_SEC', '3600'))
+    TRACKER_CACHE_SIZE = int(os.getenv('TRACKER_CACHE_SIZE', '5000'))
+    # finished trips: Douglas-Peucker the path into trip_path_archive, drop the raw rows
+    TRIP_COMPACT_ON_END = os.getenv('TRIP_COMPACT_ON_END', 'false').lower() in ('1', 'true', 'yes')
+    TRIP_COMPACT_TOLERANCE_M = float(os.getenv('TRIP_COMPACT_TOLERANCE_M', '5'))
+
+    # verified JWTs: sha256(token) -> claims, so repeat requests skip HS256 verification
+    TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', '10000'))
+    TOKEN_CACHE_TTL_SEC = float(os.getenv('TOKEN_CACHE_TTL_SEC', '300'))
+
+    # password KDF runs in its own process pool; past the queue limit auth answers 503
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', '2'))
+    PASSWORD_HASH_QUEUE_MAX = int(os.getenv('PASSWORD_HASH_QUEUE_MAX', '32'))
+    PASSWORD_HASH_TIMEOUT_SEC = float(os.getenv('PASSWORD_HASH_TIMEOUT_SEC', '10'))
+    # werkzeug method string, e.g. "scrypt:32768:8:1" or "pbkdf2:sha256:600000"
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+
+    # request log: JSON lines via a background thread, sampled per endpoint
+    REQUEST_LOG_ENABLED = os.getenv('REQUEST_LOG_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    REQUEST_LOG_SAMPLE = float(os.getenv('REQUEST_LOG_SAMPLE', '1.0'))
+    # "trip_bp.trip_ping=0.01,trip_bp.trip_pings=0.05" (endpoint=rate); 5xx is always logged
+    REQUEST_LOG_ROUTE_SAMPLES = os.getenv('REQUEST_LOG_ROUTE_SAMPLES', '')
+    REQUEST_LOG_HEADERS = os.getenv('REQUEST_LOG_HEADERS', 'true').lower() in ('1', 'true', 'yes')
+    REQUEST_LOG_REDACT = os.getenv('REQUEST_LOG_REDACT', 'authorization,cookie,set-cookie,proxy-authorization,x-api-key')
+    REQUEST_LOG_BODY = os.getenv('REQUEST_LOG_BODY', 'false').lower() in ('1', 'true', 'yes')
+    REQUEST_LOG_BODY_MAX = int(os.getenv('REQUEST_LOG_BODY_MAX', '2048'))
+    # endpoints whose bodies carry credentials are never logged; these fields are masked elsewhere
+    REQUEST_LOG_BODY_SKIP = os.getenv('REQUEST_LOG_BODY_SKIP', 'auth.register,auth.login,user_bp.user')
+    REQUEST_LOG_BODY_REDACT = os.getenv('REQUEST_LOG_BODY_REDACT', 'password,token,phone_number')
+    REQUEST_LOG_QUEUE_MAX = int(os.getenv('REQUEST_LOG_QUEUE_MAX', '10000'))
+
+    # /metrics (Prometheus text) with "Authorization: Bearer <METRICS_TOKEN>"; no token = no endpoint
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+    # X-Profile header (HMAC with PROFILE_SECRET) profiles one request into PROFILE_DIR; unset = off
+    PROFILE_SECRET = os.getenv('PROFILE_SECRET', '')
+    PROFILE_DIR = os.getenv('PROFILE_DIR', '/tmp/safepath-profiles')
+    PROFILE_MAX_AGE_SEC = float(os.getenv('PROFILE_MAX_AGE_SEC', '300'))
+    PROFILE_SAMPLE_MS = float(os.getenv('PROFILE_SAMPLE_MS', '1'))
+
+    # dev/test: off | warn | raise when one relationship lazy-loads NPLUS1_THRESHOLD times per request
+    NPLUS1_DETECT = os.getenv('NPLUS1_DETECT', 'off').lower()
+    NPLUS1_THRESHOLD = int(os.getenv('NPLUS1_THRESHOLD', '5'))
+
+    # ?ids= multi-get: requests above the max get a 400; the service fetches in IN (...) chunks
+    IDS_MAX_PER_REQUEST = int(os.getenv('IDS_MAX_PER_REQUEST', '400'))
+    IDS_CHUNK_SIZE = int(os.getenv('IDS_CHUNK_SIZE', '200'))
+
+    # "orjson" (when installed) or "default" (Flask's stdlib json provider)
+    JSON_ENCODER = os.getenv('JSON_ENCODER', 'orjson')
+
     SQLALCHEMY_ENGINE_OPTIONS = {
         "pool_pre_ping": True,
         "pool_recycle": 280,
@@ -1,28 +1,23 @@
 # models.py
-from decimal import Decimal
-from datetime import date, datetime
-from sqlalchemy import inspect
+from datetime import datetime
 from sqlalchemy.sql import func
+from sqlalchemy.dialects import mysql
 from sqlalchemy import UniqueConstraint, CheckConstraint, ForeignKey
 from . import db
+from app.utils.route_signature import stored_cells
+from app.utils.serializers import serializer_for
 
 class BaseModel(db.Model):
     __abstract__ = True
 
-    def _serialize_value(self, val):
-        if isinstance(val, (bytes, bytearray, memoryview)):
-            return val.hex()
-        if isinstance(val, Decimal):
-            return float(val)
-        if isinstance(val, (datetime, date)):
-            return val.isoformat()
-        return val
+    def to_dict(self, fields=None):
+        return serializer_for(type(self), fields)(self)
 
-    def to_dict(self):
-        out = {}
-        for c in inspect(self).mapper.column_attrs:
-            out[c.key] = self._serialize_value(getattr(self, c.key))
-        return out
+
+def _updated_at():
+    # microseconds so two edits in the same second still change the ETag version
+    return db.Column(db.DateTime().with_variant(mysql.DATETIME(fsp=6), "mysql"),
+                     default=datetime.utcnow, onupdate=datetime.utcnow)
 
 
 class UserInformation(BaseModel):
@@ -36,6 +31,7 @@ class UserInformation(BaseModel):
     # Schema: VARCHAR(50) NOT NULL UNIQUE
     phone_number = db.Column(db.String(50), nullable=False, unique=True)
     date_of_birth = db.Column(db.Date, nullable=False)
+    updated_at = _updated_at()
 
     user = db.relationship('User', back_populates='user_information', uselist=False)
 
@@ -48,6 +44,7 @@ class User(BaseModel):
     email = db.Column(db.String(100), unique=True, nullable=False)
     password = db.Column(db.String(512), nullable=False)
     created_at = db.Column(db.DateTime, server_default=func.now(), nullable=False)
+    updated_at = _updated_at()
 
     user_information = db.relationship(
         'UserInformation', back_populates='user', uselist=False, cascade="all, delete-orphan"
@@ -68,8 +65,10 @@ class User(BaseModel):
 
     drivers = db.relationship('Driver', back_populates='user', cascade="all, delete-orphan")
 
-    def to_dict(self):
-        data = super().to_dict()
+    def to_dict(self, fields=None):
+        data = super().to_dict(fields)
+        if fields is not None:
+            return data
         data["user_information"] = self.user_information.to_dict() if self.user_information else None
         return data
 
@@ -83,6 +82,7 @@ class Driver(BaseModel):
     car_type = db.Column(db.String(100), nullable=False)
     date = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, server_default=func.now(), nullable=False)
+    updated_at = _updated_at()
 
     user = db.relationship('User', back_populates='drivers')
 
@@ -104,6 +104,7 @@ class UserContact(BaseModel):
     label = db.Column(db.String(100))
     is_emergency = db.Column(db.Boolean, default=False, nullable=False)
     created_at = db.Column(db.DateTime, server_default=func.now(), nullable=False)
+    updated_at = _updated_at()
 
     __table_args__ = (
         UniqueConstraint('user_id', 'contact_user_id', name='uq_user_contact_pair'),
@@ -122,12 +123,49 @@ class RouteCluster(BaseModel):
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     origin_hash = db.Column(db.String(24), nullable=False)
     dest_hash   = db.Column(db.String(24), nullable=False)
-    # store the route signature (list of geohashes) as JSON text
-    geohashes_json = db.Column(db.Text, nullable=False)
+    # route signature: sorted little-endian int64 cells (see app/utils/route_signature.py).
+    # geohashes_json is the legacy JSON list of geohash strings; readers accept either.
+    geohashes_bin = db.Column(db.LargeBinary, nullable=True)
+    geohashes_json = db.Column(db.Text, nullable=True)
+    sig_digest = db.Column(db.String(32), nullable=True)
     trips_count = db.Column(db.Integer, nullable=False, default=0)
     status = db.Column(db.Enum('UNUSUAL', 'NORMAL', name='cluster_status'),
                        nullable=False, default='UNUSUAL')
     last_seen = db.Column(db.DateTime, server_default=func.now(), nullable=False)
+    # MinHash sketch (little-endian uint32[]) used by the LSH match mode
+    minhash = db.Column(db.LargeBinary, nullable=True)
+
+    __table_args__ = (
+        # identical signatures on one OD pair are one cluster (upsert target)
+        UniqueConstraint('origin_hash', 'dest_hash', 'sig_digest', name='uq_cluster_sig'),
+        db.Index('idx_od', 'origin_hash', 'dest_hash'),
+    )
+
+    bands = db.relationship('RouteClusterBand', backref='cluster', cascade="all, delete-orphan")
+
+    def signature_cells(self):
+        return stored_cells(self.geohashes_bin, self.geohashes_json)
+
+
+class RouteClusterBand(BaseModel):
+    """LSH bucket of one band of a cluster's MinHash sketch."""
+    __tablename__ = "route_cluster_band"
+
+    cluster_id = db.Column(db.Integer, db.ForeignKey('route_cluster.id', ondelete="CASCADE"), primary_key=True)
+    band = db.Column(db.SmallInteger, primary_key=True, autoincrement=False)
+    bucket = db.Column(db.BigInteger, nullable=False)
+
+    __table_args__ = (
+        db.Index('idx_band_bucket', 'band', 'bucket'),
+    )
+
+
+class RouteOdLock(BaseModel):
+    """One row per OD pair; locking it serialises cluster creation for that pair."""
+    __tablename__ = "route_od_lock"
+
+    origin_hash = db.Column(db.String(24), primary_key=True)
+    dest_hash = db.Column(db.String(24), primary_key=True)
 
 
 class Trip(BaseModel):
@@ -160,6 +198,7 @@ class Trip(BaseModel):
     cluster_sim = db.Column(db.Numeric(4,3))
     risk_level  = db.Column(db.Enum('NORMAL','UNUSUAL','RISKY', name='risk_level'))
     alert_sent  = db.Column(db.Boolean, nullable=False, default=False)
+    updated_at  = _updated_at()
 
     # relationships
     user = db.relationship('User', backref=db.backref('trips', cascade="all, delete-orphan"))
@@ -169,10 +208,29 @@ class Trip(BaseModel):
 class TripPoint(BaseModel):
     __tablename__ = "trip_point"
 
-    id = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
+    # SQLite only auto-increments INTEGER PRIMARY KEY
+    id = db.Column(db.BigInteger().with_variant(db.Integer, "sqlite"), primary_key=True, autoincrement=True)
     trip_id = db.Column(db.Integer, db.ForeignKey('trip.id', ondelete="CASCADE"), nullable=False, index=True)
     lat = db.Column(db.Numeric(9,6), nullable=False)
     lng = db.Column(db.Numeric(9,6), nullable=False)
     recorded_at = db.Column(db.DateTime, server_default=func.now(), nullable=False)
 
     trip = db.relationship('Trip', backref=db.backref('points', order_by="TripPoint.id.asc()", cascade="all, delete-orphan"))
+
+
+class TripPathArchive(BaseModel):
+    """
+    Compacted path of a finished trip: Douglas-Peucker simplified, stored as
+    zlib-compressed int32 microdegree deltas (utils.polyline.pack_delta_e6).
+    Replaces the trip's trip_point rows.
+    """
+    __tablename__ = "trip_path_archive"
+
+    trip_id = db.Column(db.Integer, db.ForeignKey('trip.id', ondelete="CASCADE"), primary_key=True)
+    path_blob = db.Column(db.LargeBinary, nullable=False)
+    raw_points = db.Column(db.Integer, nullable=False)
+    kept_points = db.Column(db.Integer, nullable=False)
+    tolerance_m = db.Column(db.Float, nullable=False)
+    first_recorded_at = db.Column(db.DateTime)
+    last_recorded_at = db.Column(db.DateTime)
+    compacted_at = db.Column(db.DateTime, server_default=func.now(), nullable=False)
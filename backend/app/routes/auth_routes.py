@@ -1,7 +1,7 @@
 from flask import Blueprint, request, jsonify
 
-from werkzeug.security import generate_password_hash, check_password_hash
 from app.models import User, UserInformation, db
+from app.services.password_hasher import PasswordHashBusy, check_password, hash_password
 from app.utils.jwt_helpers import generate_token
 
 auth_bp = Blueprint("auth", __name__)
@@ -20,11 +20,16 @@ def register():
     if User.query.filter_by(email=email).first():
         return jsonify({"error": "Email already exists"}), 409
 
+    try:
+        pwhash = hash_password(password)
+    except PasswordHashBusy:
+        return jsonify({"error": "Too many sign-ins right now, retry shortly"}), 503, {"Retry-After": "2"}
+
     # Create user
     user = User(
         name=name,
         email=email,
-        password=generate_password_hash(password),
+        password=pwhash,
     )
     db.session.add(user)
     db.session.flush()  # Assigns user.id
@@ -54,7 +59,11 @@ def login():
     password = data.get("password")
 
     user = User.query.filter_by(email=email).first()
-    if not user or not check_password_hash(user.password, password):
+    try:
+        ok = user is not None and check_password(user.password, password)
+    except PasswordHashBusy:
+        return jsonify({"error": "Too many sign-ins right now, retry shortly"}), 503, {"Retry-After": "2"}
+    if not ok:
         return jsonify({"error": "Invalid email or password"}), 401
 
     token = generate_token(user)
@@ -1,40 +1,84 @@
+import hashlib
 from flask.views import MethodView
-from flask import request, jsonify
+from flask import current_app, make_response, request, jsonify
 from app.utils.jwt_helpers import token_required
+from app.utils.serializers import column_keys
 
-RESERVED = {"limit", "offset", "order_by", "order_dir", "last", "ids"}
+RESERVED = {"limit", "offset", "order_by", "order_dir", "last", "ids", "cursor", "total", "fields"}
+CURSOR_DEFAULT_LIMIT = 50
 
 
-def _parse_ids_arg(arg: str | None) -> list[int]:
-    if not arg:
-        return []
-
+def parse_ids_arg() -> list[int]:
+    """?ids=1,2&ids=3 -> [1, 2, 3] (deduplicated, in order); ValueError past IDS_MAX_PER_REQUEST."""
     ids = []
+    for arg in request.args.getlist("ids"):
+        ids += [int(part) for part in (p.strip() for p in arg.split(",")) if part.isdigit()]
+    ids = list(dict.fromkeys(ids))
+    max_ids = current_app.config.get("IDS_MAX_PER_REQUEST", 400)
+    if len(ids) > max_ids:
+        raise ValueError(f"too many ids (max {max_ids})")
+    return ids
+
+def parse_fields_arg(model) -> list[str] | None:
+    """?fields=a,b -> ["id", "a", "b"] (id always included); ValueError on unknown columns."""
+    arg = request.args.get("fields")
+    if not arg:
+        return None
+    allowed = set(column_keys(model))
+    fields = ["id"]
     for part in arg.split(","):
         part = part.strip()
-        if part.isdigit():
-            ids.append(int(part))
-
-    ids += [int(x) for x in request.args.getlist("ids") if x.isdigit()]
-    seen = set()
-    ordered = []
-    for i in ids:
-        if i not in seen:
-            seen.add(i)
-            ordered.append(i)
-    return ordered
+        if not part or part in fields:
+            continue
+        if part not in allowed:
+            raise ValueError(f"unknown field: {part}")
+        fields.append(part)
+    return fields
+
+def etag_for(version: str, *scope) -> str:
+    """ETag for this URL (path + query string) at a given data version."""
+    key = "|".join((request.path, request.query_string.decode("latin-1"), version, *map(str, scope)))
+    return hashlib.blake2b(key.encode(), digest_size=12).hexdigest()
+
+
+def conditional(etag: str, build):
+    """304 if the client already has `etag`, else build() with the ETag attached."""
+    if etag in request.if_none_match:
+        resp = current_app.response_class(status=304)
+        resp.set_etag(etag)
+        return resp
+    resp = make_response(build())
+    if resp.status_code == 200:
+        resp.set_etag(etag)
+    return resp
 
 class BaseCRUDView(MethodView):
     service_class = None
 
+    def _version(self, id, ids):
+        svc = self.service_class
+        if id is not None:
+            return svc.item_version(id)
+        if ids:
+            return svc.ids_version(ids)
+        return svc.list_version(filters={k: v for k, v in request.args.items() if k not in RESERVED})
+
     @token_required
     def get(self, id=None):
+        try:
+            fields = parse_fields_arg(self.service_class.model)
+            ids = parse_ids_arg() if id is None else []
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        # version check first: an unchanged resource costs one aggregate query
+        return conditional(etag_for(self._version(id, ids)), lambda: self._get(id, fields, ids))
+
+    def _get(self, id, fields, ids):
         if id is None:
-            ids = _parse_ids_arg(request.args.get("ids"))
             if ids:
-                items = self.service_class.get_many_by_ids(ids, preserve_order=True)
+                items = self.service_class.get_many_by_ids(ids, preserve_order=True, fields=fields)
                 return jsonify({
-                    "data": [i.to_dict() for i in items],
+                    "data": [i.to_dict(fields) for i in items],
                     "meta": {"total": len(items), "ids": ids}
                 })
             
@@ -42,33 +86,49 @@ class BaseCRUDView(MethodView):
             offset = request.args.get("offset", default=0, type=int)
             order_by = request.args.get("order_by")
             order_dir = request.args.get("order_dir", "desc")
+            # ?cursor= (empty for the first page) switches to keyset paging; totals are opt-in there
+            cursor = request.args.get("cursor")
+            if cursor is not None and limit is None:
+                limit = CURSOR_DEFAULT_LIMIT
+            with_total = request.args.get("total", "false" if cursor is not None else "true").lower() in ("1", "true", "yes")
             get_last = request.args.get("last", "false").lower() in ("1", "true", "yes")
             filters = {k: v for k, v in request.args.items() if k not in RESERVED}
 
             if get_last:
-                item = self.service_class.get_last(filters=filters, order_by=order_by, order_dir=order_dir)
-                return (jsonify(item.to_dict()), 200) if item else ("Not found", 404)
-
-            items, total = self.service_class.list(
-                filters=filters,
-                order_by=order_by,
-                order_dir=order_dir,
-                limit=limit,
-                offset=offset,
-            )
+                item = self.service_class.get_last(filters=filters, order_by=order_by, order_dir=order_dir,
+                                                   fields=fields)
+                return (jsonify(item.to_dict(fields)), 200) if item else ("Not found", 404)
+
+            try:
+                items, total = self.service_class.list(
+                    filters=filters,
+                    order_by=order_by,
+                    order_dir=order_dir,
+                    limit=limit,
+                    offset=offset,
+                    cursor=cursor,
+                    with_total=with_total,
+                    fields=fields,
+                )
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            next_cursor = None
+            if cursor is not None and items and len(items) == limit:
+                next_cursor = self.service_class.cursor_after(items[-1], order_by, order_dir)
             return jsonify({
-                "data": [i.to_dict() for i in items],
+                "data": [i.to_dict(fields) for i in items],
                 "meta": {
                     "total": total,
                     "limit": limit,
-                    "offset": offset,
+                    "offset": offset if cursor is None else None,
                     "order_by": order_by or self.service_class.default_order_by,
                     "order_dir": order_dir or self.service_class.default_order_dir,
+                    "next_cursor": next_cursor,
                 }
             })
 
-        item = self.service_class.get_by_id(id)
-        return jsonify(item.to_dict()) if item else ("Not found", 404)
+        item = self.service_class.get_by_id(id, fields=fields)
+        return jsonify(item.to_dict(fields)) if item else ("Not found", 404)
 
     @token_required
     def post(self):
@@ -1,11 +1,9 @@
 # app/routes/routes_cluster.py
-from flask import Blueprint, request, jsonify
-from datetime import datetime
-from math import radians, sin, cos, asin, sqrt
-import json
+from flask import Blueprint, request, jsonify, current_app
 
-from app import db
-from app.models import RouteCluster
+from app.services.route_cluster_service import RouteClusterService
+from app.utils.polyline import decode_polyline, resample_every_m
+from app.utils.route_signature import geohash_encode, signature_cells
 
 cluster_bp = Blueprint("cluster_bp", __name__)
 
@@ -18,57 +16,6 @@ PREC_SIG = 7
 PREC_OD  = 5
 
 # ---- helpers (same as earlier, compact) ----
-def haversine_m(a, b):
-    (lat1, lon1), (lat2, lon2) = a, b
-    R = 6371000.0
-    p1, p2 = radians(lat1), radians(lat2)
-    dlat = p2 - p1
-    dlon = radians(lon2 - lon1)
-    x = sin(dlat/2)**2 + cos(p1)*cos(p2)*sin(dlon/2)**2
-    return 2 * R * asin(sqrt(x))
-
-def decode_polyline(encoded):
-    coords = []; index = lat = lng = 0
-    while index < len(encoded):
-        for coord in (True, False):
-            result = shift = 0
-            while True:
-                b = ord(encoded[index]) - 63; index += 1
-                result |= (b & 0x1f) << shift
-                shift += 5
-                if b < 0x20: break
-            d = ~(result >> 1) if (result & 1) else (result >> 1)
-            if coord: lat += d
-            else:     lng += d
-        coords.append((lat/1e5, lng/1e5))
-    return coords
-
-def resample_every_m(points, step_m=SAMPLE_M):
-    if not points: return []
-    out = [points[0]]; acc = 0.0; a = points[0]
-    for b in points[1:]:
-        seg = haversine_m(a, b)
-        while acc + seg >= step_m and seg > 0:
-            ratio = (step_m - acc) / seg
-            lat = a[0] + ratio * (b[0] - a[0])
-            lng = a[1] + ratio * (b[1] - a[1])
-            out.append((lat, lng))
-            a = (lat, lng)
-            seg = haversine_m(a, b)
-            acc = 0.0
-        acc += seg
-        a = b
-    return out
-
-try:
-    import geohash as _gh
-    def geohash_encode(lat, lng, precision):
-        return _gh.encode(lat, lng, precision=precision)
-except Exception:
-    def geohash_encode(lat, lng, precision):
-        q = 10 ** (precision - 1)
-        return f"{round(float(lat)*q)}:{round(float(lng)*q)}"
-
 def signature_from_polyline(encoded):
     pts = decode_polyline(encoded)
     smp = resample_every_m(pts, SAMPLE_M)
@@ -81,6 +28,23 @@ def jaccard(a, b):
 def coarse_hash(lat, lng):
     return geohash_encode(float(lat), float(lng), PREC_OD)
 
+def _parse_route(item):
+    """(origin_hash, dest_hash, cells), or an error string for this item."""
+    if not isinstance(item, dict):
+        return "origin, destination, encoded_polyline required"
+    origin = item.get("origin") or {}
+    dest   = item.get("destination") or {}
+    poly   = item.get("encoded_polyline")
+    if (not poly or not isinstance(origin, dict) or not isinstance(dest, dict)
+            or "lat" not in origin or "lng" not in origin or "lat" not in dest or "lng" not in dest):
+        return "origin, destination, encoded_polyline required"
+    try:
+        return (coarse_hash(origin["lat"], origin["lng"]),
+                coarse_hash(dest["lat"], dest["lng"]),
+                signature_cells(str(poly), SAMPLE_M, PREC_SIG))
+    except (ValueError, TypeError, IndexError):
+        return "invalid coordinates or encoded_polyline"
+
 # ---- endpoint ----
 @cluster_bp.post("/clusterize")
 def clusterize_route():
@@ -88,51 +52,70 @@ def clusterize_route():
     POST /api/v1/routes/clusterize
     Body: { origin:{lat,lng}, destination:{lat,lng}, encoded_polyline:"..." }
     """
-    data = request.get_json(silent=True) or {}
-    origin = data.get("origin") or {}
-    dest   = data.get("destination") or {}
-    poly   = data.get("encoded_polyline")
-    if not poly or "lat" not in origin or "lng" not in origin or "lat" not in dest or "lng" not in dest:
-        return jsonify({"error": "origin, destination, encoded_polyline required"}), 400
-
-    sig = signature_from_polyline(poly)
-    o_hash = coarse_hash(origin["lat"], origin["lng"])
-    d_hash = coarse_hash(dest["lat"], dest["lng"])
+    parsed = _parse_route(request.get_json(silent=True) or {})
+    if isinstance(parsed, str):
+        return jsonify({"error": parsed}), 400
+    o_hash, d_hash, sig = parsed
 
-    candidates = RouteCluster.query.filter_by(origin_hash=o_hash, dest_hash=d_hash).all()
-    best, best_sim = None, 0.0
-    for c in candidates:
-        sim = jaccard(sig, json.loads(c.geohashes_json))
-        if sim > best_sim:
-            best, best_sim = c, sim
+    best, best_sim = RouteClusterService.best_match(o_hash, d_hash, sig)
 
     if best and best_sim >= S_MATCH:
-        best.trips_count += 1
-        best.last_seen = datetime.utcnow()
-        if best.trips_count >= N_NORMAL:
-            best.status = "NORMAL"
-        db.session.commit()
-        return jsonify({
-            "cluster_id": best.id,
-            "similarity": round(best_sim, 3),
-            "status": best.status,
-            "trips_count": best.trips_count
-        }), 200
+        row = RouteClusterService.increment_count(best.id, make_normal_at=N_NORMAL)
+        if row is not None:
+            return jsonify({
+                "cluster_id": row.id,
+                "similarity": round(best_sim, 3),
+                "status": row.status,
+                "trips_count": row.trips_count
+            }), 200
+
+    # create new unusual cluster (or join the one a concurrent request just made)
+    row, sim, created = RouteClusterService.create_cluster(o_hash, d_hash, sig,
+                                                           s_match=S_MATCH, make_normal_at=N_NORMAL)
+    res = {
+        "cluster_id": row.id,
+        "similarity": round(sim, 3),
+        "status": row.status,
+        "trips_count": row.trips_count
+    }
+    if not created:
+        return jsonify(res), 200
+    res["note"] = "New cluster created"
+    return jsonify(res), 201
+
+@cluster_bp.post("/clusterize/batch")
+def clusterize_routes_batch():
+    """
+    POST /api/v1/routes/clusterize/batch
+    Body: { routes: [{ origin:{lat,lng}, destination:{lat,lng}, encoded_polyline:"..." }, ...] }
+          (a bare JSON array is accepted too)
+    Returns one result per route, in input order; invalid routes get an "error" entry.
+    """
+    data = request.get_json(silent=True)
+    routes = data.get("routes") if isinstance(data, dict) else data
+    if not isinstance(routes, list) or not routes:
+        return jsonify({"error": "routes must be a non-empty array"}), 400
+    max_items = current_app.config.get("CLUSTERIZE_BATCH_MAX", 200)
+    if len(routes) > max_items:
+        return jsonify({"error": f"at most {max_items} routes per batch"}), 413
+
+    parsed = [_parse_route(r) for r in routes]
+    valid = [p for p in parsed if not isinstance(p, str)]
+    scored = iter(RouteClusterService.clusterize_many(valid, s_match=S_MATCH, make_normal_at=N_NORMAL))
 
-    # create new unusual cluster
-    new_c = RouteCluster(
-        origin_hash=o_hash,
-        dest_hash=d_hash,
-        geohashes_json=json.dumps(sig),
-        trips_count=1,
-        status='UNUSUAL'
-    )
-    db.session.add(new_c)
-    db.session.commit()
-    return jsonify({
-        "cluster_id": new_c.id,
-        "similarity": round(best_sim, 3),
-        "status": new_c.status,
-        "trips_count": new_c.trips_count,
-        "note": "New cluster created"
-    }), 201
+    results = []
+    for p in parsed:
+        if isinstance(p, str):
+            results.append({"error": p})
+            continue
+        cluster_id, sim, status, count, created = next(scored)
+        res = {
+            "cluster_id": cluster_id,
+            "similarity": round(sim, 3),
+            "status": status,
+            "trips_count": count,
+        }
+        if created:
+            res["note"] = "New cluster created"
+        results.append(res)
+    return jsonify({"data": results, "meta": {"total": len(results)}}), 200
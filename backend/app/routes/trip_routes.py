@@ -1,13 +1,22 @@
 # app/routes/trip_view.py
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from app.services.trip_service import TripService
 from app.services.trip_point_service import TripPointService
+from app.services.trip_point_writer import TripPointQueueFull, TripPointFlushError
+from app.services.trip_tracker import track_points, drop_tracker, warm_tracker
 from app.routes.user_scoped_crud_view import UserScopedCRUDView
 from app.utils.jwt_helpers import token_required
+from app.utils.polyline import PolylineEncoder, encode_delta_e6
+from app.utils.time import parse_utc_naive
 
 class TripView(UserScopedCRUDView):
     service_class = TripService
 
+    def post(self):
+        res, status = super().post()
+        warm_tracker(res.get_json()["id"])
+        return res, status
+
 trip_bp = Blueprint("trip_bp", __name__)
 trip_view = TripView.as_view("trip")
 
@@ -15,6 +24,18 @@ trip_view = TripView.as_view("trip")
 trip_bp.add_url_rule("/", view_func=trip_view, methods=["GET", "POST"])
 trip_bp.add_url_rule("/<int:id>", view_func=trip_view, methods=["GET", "PUT", "DELETE"])
 
+def _live_fields(live):
+    if live is None:
+        return {}
+    return {
+        "on_route": live["on_route"],
+        "deviation_m": live["deviation_m"],
+        "covered_m": live["covered_m"],
+        "remaining_m": live["remaining_m"],
+        "progress": live["progress"],
+        "eta_remaining_sec": live.get("eta_remaining_sec"),
+    }
+
 # Realtime endpoints
 @trip_bp.post("/<int:trip_id>/ping")
 @token_required
@@ -25,16 +46,69 @@ def trip_ping(trip_id):
     if lat is None or lng is None:
         return {"error": "lat,lng required"}, 400
 
-    point = TripPointService.append_point(trip_id, user_id, lat=float(lat), lng=float(lng))
+    try:
+        point = TripPointService.append_point(trip_id, user_id, lat=float(lat), lng=float(lng))
+    except TripPointQueueFull:
+        return {"error": "ping buffer full, retry shortly"}, 503, {"Retry-After": "1"}
+    except TripPointFlushError:
+        return {"error": "ping not stored, retry"}, 503, {"Retry-After": "1"}
     if point is None:
         return {"error": "trip not found or not yours"}, 404
 
-    trip = TripService.get_by_id(trip_id, user_id)
+    live = track_points(trip_id, user_id, [(float(lat), float(lng))])
+    state = TripService.get_state(trip_id)
     return jsonify({
         "trip_id": trip_id,
-        "risk_level": trip.risk_level,
-        "cluster_id": trip.cluster_id,
-        "similarity": float(trip.cluster_sim or 0.0)
+        "risk_level": state.risk_level,
+        "cluster_id": state.cluster_id,
+        "similarity": state.cluster_sim or 0.0,
+        **_live_fields(live)
+    })
+
+@trip_bp.post("/<int:trip_id>/pings")
+@token_required
+def trip_pings(trip_id):
+    """
+    Buffered pings, oldest first:
+    Body: { points: [{ lat, lng, recorded_at?: ISO-8601 }, ...] }
+    """
+    user_id = request.user["user_id"]
+    data = request.get_json(silent=True) or {}
+    raw = data.get("points")
+    if not isinstance(raw, list) or not raw:
+        return {"error": "points must be a non-empty array"}, 400
+    max_points = current_app.config.get("TRIP_PINGS_MAX", 500)
+    if len(raw) > max_points:
+        return {"error": f"at most {max_points} points per request"}, 413
+
+    points = []
+    for i, p in enumerate(raw):
+        try:
+            point = {"lat": float(p["lat"]), "lng": float(p["lng"])}
+            if p.get("recorded_at"):
+                point["recorded_at"] = parse_utc_naive(p["recorded_at"])
+        except (KeyError, TypeError, ValueError):
+            return {"error": f"points[{i}]: lat,lng required, recorded_at must be ISO-8601"}, 400
+        points.append(point)
+
+    try:
+        written = TripPointService.append_points(trip_id, user_id, points)
+    except TripPointQueueFull:
+        return {"error": "ping buffer full, retry shortly"}, 503, {"Retry-After": "1"}
+    except TripPointFlushError:
+        return {"error": "pings not stored, retry"}, 503, {"Retry-After": "1"}
+    if written is None:
+        return {"error": "trip not found or not yours"}, 404
+
+    live = track_points(trip_id, user_id, [(p["lat"], p["lng"]) for p in points])
+    state = TripService.get_state(trip_id)
+    return jsonify({
+        "trip_id": trip_id,
+        "accepted": written,
+        "risk_level": state.risk_level,
+        "cluster_id": state.cluster_id,
+        "similarity": state.cluster_sim or 0.0,
+        **_live_fields(live)
     })
 
 @trip_bp.post("/<int:trip_id>/end")
@@ -42,4 +116,39 @@ def trip_ping(trip_id):
 def trip_end(trip_id):
     user_id = request.user["user_id"]
     t = TripService.finalize(trip_id, user_id, status="COMPLETED")
+    drop_tracker(trip_id)
+    if t and current_app.config.get("TRIP_COMPACT_ON_END", False):
+        TripPointService.compact_path(trip_id)
     return (jsonify(t.to_dict()), 200) if t else ("Not found", 404)
+
+PATH_FORMATS = ("polyline", "delta", "json")
+
+@trip_bp.get("/<int:trip_id>/path")
+@token_required
+def trip_path(trip_id):
+    """
+    Recorded path, oldest point first.
+    ?format=polyline (default): Google encoded polyline, 1e-5 deg precision
+    ?format=delta: base64 int32 microdegrees, first point absolute then deltas (lossless)
+    ?format=json: [[lat, lng], ...]
+    """
+    user_id = request.user["user_id"]
+    fmt = request.args.get("format", "polyline")
+    if fmt not in PATH_FORMATS:
+        return {"error": f"format must be one of {', '.join(PATH_FORMATS)}"}, 400
+    if not TripPointService.owns(trip_id, user_id):
+        return {"error": "trip not found or not yours"}, 404
+
+    out = {"trip_id": trip_id, "format": fmt}
+    if fmt == "polyline":
+        enc = PolylineEncoder()
+        parts = [enc.feed(zip(lat.tolist(), lng.tolist()))
+                 for lat, lng in TripPointService.iter_path(trip_id)]
+        out.update(points=enc.count, polyline="".join(parts))
+    elif fmt == "delta":
+        lat, lng = TripPointService.path_arrays(trip_id)
+        out.update(points=int(lat.size), delta_e6=encode_delta_e6(lat, lng))
+    else:
+        path = TripPointService.get_path(trip_id)
+        out.update(points=len(path), path=path)
+    return jsonify(out)
@@ -1,8 +1,10 @@
 from flask.views import MethodView
 from flask import request, jsonify
 from app.utils.jwt_helpers import token_required
+from app.routes.base_view import conditional, etag_for, parse_fields_arg, parse_ids_arg
 
-RESERVED = {"range", "tz_offset", "limit", "offset", "order_by", "order_dir", "last"}
+RESERVED = {"range", "tz_offset", "limit", "offset", "order_by", "order_dir", "last", "ids", "cursor", "total", "fields"}
+CURSOR_DEFAULT_LIMIT = 50
 
 
 class UserScopedCRUDView(MethodView):
@@ -13,10 +15,39 @@ class UserScopedCRUDView(MethodView):
 
 
 
+    def _version(self, id, user_id, ids):
+        svc = self.service_class
+        if id is not None:
+            return svc.item_version(id, user_id)
+        if ids:
+            return svc.ids_scoped_version(ids, user_id)
+        return svc.list_scoped_version(
+            user_id,
+            range_key=request.args.get("range", "all"),
+            tz_offset=int(request.args.get("tz_offset", 0)),
+            filters={k: v for k, v in request.args.items() if k not in RESERVED},
+        )
+
     def get(self, id=None):
         user_id = request.user["user_id"]
-
+        try:
+            fields = parse_fields_arg(self.service_class.model)
+            ids = parse_ids_arg() if id is None else []
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        # version check first: an unchanged resource costs one aggregate query
+        etag = etag_for(self._version(id, user_id, ids), user_id)
+        return conditional(etag, lambda: self._get(id, user_id, fields, ids))
+
+    def _get(self, id, user_id, fields, ids):
         if id is None:
+            if ids:
+                items = self.service_class.get_many_by_ids_scoped(ids, user_id, fields=fields)
+                return jsonify({
+                    "data": [i.to_dict(fields) for i in items],
+                    "meta": {"total": len(items), "ids": ids}
+                })
+
             # pagination & ordering
             range_key = request.args.get("range", "all")
             tz_offset = int(request.args.get("tz_offset", 0))
@@ -24,6 +55,11 @@ class UserScopedCRUDView(MethodView):
             offset = request.args.get("offset", default=0, type=int)
             order_by = request.args.get("order_by")  # e.g., "date"
             order_dir = request.args.get("order_dir", "desc")  # "asc" | "desc"
+            # ?cursor= (empty for the first page) switches to keyset paging; totals are opt-in there
+            cursor = request.args.get("cursor")
+            if cursor is not None and limit is None:
+                limit = CURSOR_DEFAULT_LIMIT
+            with_total = request.args.get("total", "false" if cursor is not None else "true").lower() in ("1", "true", "yes")
 
             # support ?last=true to fetch only the latest item
             get_last = request.args.get("last", "false").lower() in ("1", "true", "yes")
@@ -39,34 +75,45 @@ class UserScopedCRUDView(MethodView):
                     filters=filters,
                     order_by=order_by,
                     order_dir=order_dir,
+                    fields=fields,
+                )
+                return (jsonify(item.to_dict(fields)), 200) if item else ("Not found", 404)
+
+            try:
+                items, total = self.service_class.list_scoped(
+                    user_id,
+                    range_key=range_key,
+                    tz_offset=tz_offset,
+                    filters=filters,
+                    order_by=order_by,
+                    order_dir=order_dir,
+                    limit=limit,
+                    offset=offset,
+                    cursor=cursor,
+                    with_total=with_total,
+                    fields=fields,
                 )
-                return (jsonify(item.to_dict()), 200) if item else ("Not found", 404)
-
-            items, total = self.service_class.list_scoped(
-                user_id,
-                range_key=range_key,
-                tz_offset=tz_offset,
-                filters=filters,
-                order_by=order_by,
-                order_dir=order_dir,
-                limit=limit,
-                offset=offset,
-            )
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            next_cursor = None
+            if cursor is not None and items and len(items) == limit:
+                next_cursor = self.service_class.cursor_after(items[-1], order_by, order_dir)
             return jsonify({
-                "data": [i.to_dict() for i in items],
+                "data": [i.to_dict(fields) for i in items],
                 "meta": {
                     "total": total,
                     "limit": limit,
-                    "offset": offset,
+                    "offset": offset if cursor is None else None,
                     "order_by": order_by or self.service_class.default_order_by,
                     "order_dir": order_dir or self.service_class.default_order_dir,
+                    "next_cursor": next_cursor,
                     "range": range_key,
                 }
             })
 
         # id-specific
-        item = self.service_class.get_by_id(id, user_id)
-        return jsonify(item.to_dict()) if item else ("Not found", 404)
+        item = self.service_class.get_by_id(id, user_id, fields=fields)
+        return jsonify(item.to_dict(fields)) if item else ("Not found", 404)
 
 
 
@@ -2,12 +2,18 @@
 from __future__ import annotations
 
 from app.models import db
-from sqlalchemy import case 
+from flask import current_app
+from sqlalchemy import DateTime, and_, func, literal, or_
+from sqlalchemy.orm import load_only
+from app.utils.cursor import decode_cursor, encode_cursor
 class BaseService:
     model = None
     default_order_by = "id"     # override per model if needed (e.g., "date" or "created_at")
     default_order_dir = "desc"  # "asc" or "desc"
     filterable_fields = None    # optional allowlist; if None, all model columns are candidates
+    # loader options for the relationships to_dict touches, e.g. (selectinload(User.user_information),);
+    # applied by get/list/get_last/get_many_by_ids unless a sparse fieldset is requested
+    default_load_options = ()
 
 
     @classmethod
@@ -15,8 +21,8 @@ class BaseService:
         return cls.model.query.all()
 
     @classmethod
-    def get_by_id(cls, id_):
-        return cls.model.query.get(id_)
+    def get_by_id(cls, id_, fields=None):
+        return cls._apply_fields(cls.model.query, fields).get(id_)
 
     @classmethod
     def create(cls, data):
@@ -57,6 +63,18 @@ class BaseService:
             return cls._column(name) is not None
         return name in cls.filterable_fields and cls._column(name) is not None
 
+    @classmethod
+    def _apply_fields(cls, query, fields, *extra):
+        """
+        load_only the requested columns (plus id and whatever else the query needs).
+        Without fields the service's default_load_options apply instead.
+        """
+        if not fields:
+            return query.options(*cls.default_load_options) if cls.default_load_options else query
+        names = dict.fromkeys(("id", *fields, *extra))
+        cols = [cls._column(n) for n in names if cls._column(n) is not None]
+        return query.options(load_only(*cols))
+
     @classmethod
     def _apply_filters(cls, query, filters: dict | None):
         if not filters:
@@ -67,13 +85,69 @@ class BaseService:
         return query
 
     @classmethod
-    def _apply_ordering(cls, query, order_by: str | None, order_dir: str | None):
+    def _resolve_ordering(cls, order_by: str | None, order_dir: str | None):
+        """(column name, "asc"|"desc") actually used for ordering."""
         ob = order_by or cls.default_order_by
-        col = cls._column(ob) or cls._column("id")
+        if cls._column(ob) is None:
+            ob = "id"
+        direction = (order_dir or cls.default_order_dir or "desc").lower()
+        return ob, ("asc" if direction == "asc" else "desc")
+
+    @classmethod
+    def _keyset_key(cls, col):
+        """
+        Expression keyset pages sort and seek on. SQLite keeps DATETIME as text, and
+        server_default now() rows ("...:SS") never equal a bound value ("...:SS.ffffff"),
+        so there both sides go through one strftime format. Other columns/dialects: as is.
+        """
+        if isinstance(col.type, DateTime) and db.session.get_bind().dialect.name == "sqlite":
+            return lambda x: func.strftime("%Y-%m-%d %H:%M:%f", x)
+        return lambda x: x
+
+    @classmethod
+    def _apply_ordering(cls, query, order_by: str | None, order_dir: str | None, tiebreak: bool = False):
+        ob, direction = cls._resolve_ordering(order_by, order_dir)
+        col = cls._column(ob)
         if col is None:
             return query
-        direction = (order_dir or cls.default_order_dir or "desc").lower()
-        return query.order_by(col.asc() if direction == "asc" else col.desc())
+        if tiebreak:
+            col = cls._keyset_key(col)(col)
+        query = query.order_by(col.asc() if direction == "asc" else col.desc())
+        if tiebreak and ob != "id":
+            # keyset pages need a total order
+            query = query.order_by(cls.model.id.asc() if direction == "asc" else cls.model.id.desc())
+        return query
+
+    @classmethod
+    def _apply_cursor(cls, query, cursor: str, order_by: str | None, order_dir: str | None):
+        """
+        Seek past the (value, id) stored in the cursor instead of OFFSET.
+        Raises ValueError for a malformed cursor or one from a different ordering.
+        """
+        ob, direction = cls._resolve_ordering(order_by, order_dir)
+        c = decode_cursor(cursor)
+        if (c["order_by"], c["order_dir"]) != (ob, direction):
+            raise ValueError("cursor does not match order_by/order_dir")
+        col, id_col = cls._column(ob), cls.model.id
+        v, last_id = c["value"], c["id"]
+        if ob == "id":
+            return query.filter(id_col > last_id if direction == "asc" else id_col < last_id)
+        key = cls._keyset_key(col)
+        col, v = key(col), (None if v is None else key(literal(v, col.type)))
+        # NULLs sort first ascending / last descending (MySQL, SQLite)
+        if direction == "asc":
+            if v is None:
+                return query.filter(or_(and_(col.is_(None), id_col > last_id), col.isnot(None)))
+            return query.filter(or_(col > v, and_(col == v, id_col > last_id)))
+        if v is None:
+            return query.filter(col.is_(None), id_col < last_id)
+        return query.filter(or_(col < v, and_(col == v, id_col < last_id), col.is_(None)))
+
+    @classmethod
+    def cursor_after(cls, item, order_by: str | None = None, order_dir: str | None = None) -> str:
+        """Cursor that continues a listing right after `item`."""
+        ob, direction = cls._resolve_ordering(order_by, order_dir)
+        return encode_cursor(ob, direction, getattr(item, ob), item.id)
 
     @classmethod
     def _apply_pagination(cls, query, limit: int | None, offset: int | None):
@@ -84,36 +158,79 @@ class BaseService:
         return query
     
     @classmethod
-    def list(cls, *, filters=None, order_by=None, order_dir=None, limit=None, offset=None):
+    def _version_of(cls, query) -> str:
+        """
+        Cheap change token for the rows a query matches: count, max(id) and the
+        newest updated_at (created_at if the model has none). Any insert, delete
+        or ORM update of those rows changes it.
+        """
+        cols = [func.count(cls.model.id), func.max(cls.model.id)]
+        vcol = cls._column("updated_at") or cls._column("created_at")
+        if vcol is not None:
+            cols.append(func.max(vcol))
+        row = query.with_entities(*cols).order_by(None).one()
+        return ":".join("" if v is None else str(v) for v in row)
+
+    @classmethod
+    def list_version(cls, *, filters=None) -> str:
+        return cls._version_of(cls._apply_filters(cls.model.query, filters))
+
+    @classmethod
+    def item_version(cls, id_) -> str:
+        return cls._version_of(cls.model.query.filter(cls.model.id == id_))
+
+    @classmethod
+    def ids_version(cls, ids: list[int]) -> str:
+        return cls._version_of(cls.model.query.filter(cls.model.id.in_(ids)))
+
+    @classmethod
+    def list(cls, *, filters=None, order_by=None, order_dir=None, limit=None, offset=None,
+             cursor=None, with_total=True, fields=None):
         """
         Returns (items, total) using optional filters/pagination.
+        With a cursor (see cursor_after) the page is found by an indexed seek
+        and offset is ignored. total is None unless with_total.
+        fields limits the columns fetched (load_only).
         """
         q = cls.model.query
         q = cls._apply_filters(q, filters)
-        total = q.count()
-        q = cls._apply_ordering(q, order_by, order_dir)
-        q = cls._apply_pagination(q, limit, offset)
+        total = q.count() if with_total else None
+        q = cls._apply_fields(q, fields, cls._resolve_ordering(order_by, order_dir)[0])
+        if cursor:
+            q = cls._apply_cursor(q, cursor, order_by, order_dir)
+        q = cls._apply_ordering(q, order_by, order_dir, tiebreak=cursor is not None)
+        q = cls._apply_pagination(q, limit, None if cursor is not None else offset)
         return q.all(), total
 
     @classmethod
-    def get_last(cls, *, filters=None, order_by=None, order_dir=None):
+    def get_last(cls, *, filters=None, order_by=None, order_dir=None, fields=None):
         """
         Returns the single latest item by order_by/dir (defaults to service defaults).
         """
         q = cls.model.query
         q = cls._apply_filters(q, filters)
+        q = cls._apply_fields(q, fields)
         q = cls._apply_ordering(q, order_by, order_dir)
         return q.first()
     
     @classmethod
-    def get_many_by_ids(cls, ids: list[int], preserve_order: bool = False):
+    def get_many_by_ids(cls, ids: list[int], preserve_order: bool = False, fields=None, chunk_size=None,
+                        query=None):
+        """
+        Rows for `ids`, fetched with one IN (...) per chunk of IDS_CHUNK_SIZE ids
+        (bounded statements, plain PK lookups). preserve_order puts them back in
+        the order of `ids` in Python; missing ids are skipped. `query` narrows the
+        base query (e.g. to one user's rows).
+        """
         if not ids:
             return []
-        q = cls.model.query.filter(cls.model.id.in_(ids))
-        if preserve_order:
-            order_case = case({id_: idx for idx, id_ in enumerate(ids)}, value=cls.model.id)
-            q = q.order_by(order_case)
-        return q.all()
-
-
-
+        chunk_size = chunk_size or current_app.config.get("IDS_CHUNK_SIZE", 200)
+        base = cls.model.query if query is None else query
+        rows = []
+        for i in range(0, len(ids), chunk_size):
+            q = base.filter(cls.model.id.in_(ids[i:i + chunk_size]))
+            rows.extend(cls._apply_fields(q, fields).all())
+        if not preserve_order:
+            return rows
+        by_id = {r.id: r for r in rows}
+        return [by_id[id_] for id_ in ids if id_ in by_id]
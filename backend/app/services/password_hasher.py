@@ -0,0 +1,138 @@
+# app/services/password_hasher.py
+"""
+Password hashing off the request threads.
+
+generate_password_hash / check_password_hash run in a small process pool
+(PASSWORD_HASH_WORKERS). At most PASSWORD_HASH_QUEUE_MAX calls wait behind the
+busy workers; past that PasswordHashBusy is raised and the auth routes answer
+503, so a login burst cannot hold every request thread. PASSWORD_HASH_WORKERS=0
+hashes inline (dev, tests).
+
+The pool is forked on the first hash in the process that serves it, so CLI
+commands, `flask shell` and benchmarks never fork workers, and a pool created
+before a fork (gunicorn --preload) is not reused by the children.
+"""
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class PasswordHashBusy(Exception):
+    """Every worker is busy and the wait queue is full (or the call timed out)."""
+
+
+def _hash(password, method):
+    return generate_password_hash(password, method=method)
+
+
+def _check(pwhash, password):
+    return check_password_hash(pwhash, password)
+
+
+class PasswordHasher:
+    def __init__(self, *, workers=2, queue_max=32, method="scrypt", timeout=10.0):
+        self.workers = workers
+        self.method = method
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(workers + queue_max) if workers > 0 else None
+        self._pool = None
+        self._pool_pid = None
+        self._pool_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _executor(self):
+        with self._pool_lock:
+            if self._pool is not None and self._pool_pid != os.getpid():
+                # inherited across a fork: those workers belong to the parent
+                self._pool = None
+            if self._pool is None:
+                # fork, not spawn: spawn re-runs the entry module (wsgi.py, `flask run`)
+                # in every worker. The workers only run the KDF, no locks or logging.
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("fork"))
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def _run(self, fn, *args):
+        if self._slots is None:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            with self._stats_lock:
+                self.rejected += 1
+            raise PasswordHashBusy("password hashing queue is full")
+        with self._stats_lock:
+            self.in_flight += 1
+
+        def _done(_):
+            with self._stats_lock:
+                self.in_flight -= 1
+                self.completed += 1
+            self._slots.release()
+
+        try:
+            fut = self._executor().submit(fn, *args)
+        except Exception:
+            _done(None)
+            raise
+        fut.add_done_callback(_done)
+        try:
+            return fut.result(self.timeout)
+        except FutureTimeout:
+            # the slot stays taken until the worker actually finishes
+            raise PasswordHashBusy("password hashing timed out")
+        except BrokenProcessPool:
+            with self._pool_lock:
+                self._pool = None
+            raise PasswordHashBusy("password hashing pool restarted")
+
+    def hash(self, password: str) -> str:
+        return self._run(_hash, password, self.method)
+
+    def check(self, pwhash: str, password: str) -> bool:
+        return self._run(_check, pwhash, password)
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None and self._pool_pid == os.getpid():
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "workers": self.workers,
+                "started": int(self._pool is not None),
+                "in_flight": self.in_flight,
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
+
+
+def init_password_hasher(app):
+    hasher = PasswordHasher(
+        workers=app.config.get("PASSWORD_HASH_WORKERS", 2),
+        queue_max=app.config.get("PASSWORD_HASH_QUEUE_MAX", 32),
+        method=app.config.get("PASSWORD_HASH_METHOD", "scrypt"),
+        timeout=app.config.get("PASSWORD_HASH_TIMEOUT_SEC", 10.0),
+    )
+    app.extensions["password_hasher"] = hasher
+    atexit.register(hasher.shutdown)
+    return hasher
+
+
+def hash_password(password: str) -> str:
+    return current_app.extensions["password_hasher"].hash(password)
+
+
+def check_password(pwhash: str, password: str) -> bool:
+    return current_app.extensions["password_hasher"].check(pwhash, password)
@@ -0,0 +1,135 @@
+# app/services/route_cluster_index.py
+"""
+In-process inverted index: signature cell -> RouteCluster ids, one per (origin_hash, dest_hash).
+
+Jaccard is computed from posting-list hit counts, so a lookup never decodes
+stored signatures or builds per-candidate sets. Pairs are warmed lazily from the
+DB and caught up (rows with a higher id) every `refresh_sec`, which is how
+clusters created by other workers become visible.
+"""
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from flask import current_app
+
+from app.models import RouteCluster, db
+from app.utils.route_signature import stored_cells
+
+
+class _PairIndex:
+    __slots__ = ("postings", "cells", "max_id", "checked_at")
+
+    def __init__(self):
+        self.postings = defaultdict(set)   # cell -> {cluster_id}
+        self.cells = {}                    # cluster_id -> frozenset(signature)
+        self.max_id = 0
+        self.checked_at = 0.0
+
+    def add(self, cluster_id, cells):
+        cells = frozenset(cells.tolist())
+        self.discard(cluster_id)
+        for cell in cells:
+            self.postings[cell].add(cluster_id)
+        self.cells[cluster_id] = cells
+
+    def discard(self, cluster_id):
+        # only the cluster's own postings
+        for cell in self.cells.pop(cluster_id, ()):
+            ids = self.postings.get(cell)
+            if ids is not None:
+                ids.discard(cluster_id)
+                if not ids:
+                    del self.postings[cell]
+
+    def best(self, cells):
+        cells = set(cells.tolist())
+        hits = defaultdict(int)
+        for cell in cells:
+            for cid in self.postings.get(cell, ()):
+                hits[cid] += 1
+        best_id, best_sim = None, 0.0
+        n = len(cells)
+        for cid, inter in hits.items():
+            sim = inter / max(1, n + len(self.cells[cid]) - inter)
+            # ties go to the oldest cluster, like the old scan in id order
+            if sim > best_sim or (sim == best_sim and best_id is not None and cid < best_id):
+                best_id, best_sim = cid, sim
+        return best_id, best_sim
+
+
+class RouteClusterIndex:
+    def __init__(self, refresh_sec=None, max_pairs=None):
+        self._pairs = OrderedDict()
+        self._lock = threading.RLock()
+        self._refresh_sec = refresh_sec
+        self._max_pairs = max_pairs
+
+    def _setting(self, attr, key, default):
+        val = getattr(self, attr)
+        if val is None:
+            val = current_app.config.get(key, default)
+        return val
+
+    def _load(self, idx, origin_hash, dest_hash):
+        rows = (db.session.query(RouteCluster.id, RouteCluster.geohashes_bin, RouteCluster.geohashes_json)
+                .filter(RouteCluster.origin_hash == origin_hash,
+                        RouteCluster.dest_hash == dest_hash,
+                        RouteCluster.id > idx.max_id)
+                .all())
+        for cid, blob, legacy in rows:
+            if cid not in idx.cells:
+                idx.add(cid, stored_cells(blob, legacy))
+            # only DB reads move the watermark, so rows other workers insert
+            # below a locally created id are still picked up
+            idx.max_id = max(idx.max_id, cid)
+        idx.checked_at = time.monotonic()
+
+    def _pair(self, origin_hash, dest_hash):
+        key = (origin_hash, dest_hash)
+        idx = self._pairs.get(key)
+        if idx is None:
+            idx = self._pairs[key] = _PairIndex()
+            max_pairs = self._setting("_max_pairs", "ROUTE_INDEX_MAX_PAIRS", 10000)
+            while len(self._pairs) > max_pairs:
+                self._pairs.popitem(last=False)
+        else:
+            self._pairs.move_to_end(key)
+        if time.monotonic() - idx.checked_at >= self._setting("_refresh_sec", "ROUTE_INDEX_REFRESH_SEC", 5.0):
+            self._load(idx, origin_hash, dest_hash)
+        return idx
+
+    def best_match(self, origin_hash, dest_hash, signature):
+        """(cluster_id | None, jaccard) of the closest cluster for this OD pair."""
+        with self._lock:
+            return self._pair(origin_hash, dest_hash).best(signature)
+
+    def refresh(self, origin_hash, dest_hash):
+        """Catch the pair up with the DB now, regardless of refresh_sec."""
+        with self._lock:
+            key = (origin_hash, dest_hash)
+            idx = self._pairs.get(key)
+            if idx is None:
+                self._pair(origin_hash, dest_hash)
+            else:
+                self._load(idx, origin_hash, dest_hash)
+
+    def add(self, origin_hash, dest_hash, cluster_id, signature):
+        """Register a new cluster, or replace the signature of an existing one."""
+        with self._lock:
+            idx = self._pairs.get((origin_hash, dest_hash))
+            if idx is not None:
+                idx.add(cluster_id, signature)
+
+    def discard(self, origin_hash, dest_hash, cluster_id):
+        with self._lock:
+            idx = self._pairs.get((origin_hash, dest_hash))
+            if idx is not None:
+                idx.discard(cluster_id)
+
+    def clear(self):
+        with self._lock:
+            self._pairs.clear()
+
+
+cluster_index = RouteClusterIndex()
@@ -1,6 +1,18 @@
 import json
+from collections import defaultdict
+import numpy as np
+from flask import current_app
+from sqlalchemy import case, func, insert, select, tuple_, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
 from app.services.base_service import BaseService
-from app.models import RouteCluster, db
+from app.models import RouteCluster, RouteClusterBand, RouteOdLock, db
+from app.services.route_cluster_index import cluster_index
+from app.utils.minhash import sketch, sketch_to_bytes, band_keys
+from app.utils.route_signature import (cells_to_bytes, cells_to_geohashes, jaccard_cells,
+                                       signature_digest)
 
 class RouteClusterService(BaseService):
     model = RouteCluster
@@ -15,29 +27,287 @@ class RouteClusterService(BaseService):
                 .all())
 
     @classmethod
-    def create_cluster(cls, origin_hash: str, dest_hash: str, geohashes: list[str]):
-        return cls.create({
+    def _lsh_settings(cls):
+        cfg = current_app.config
+        return cfg.get("MINHASH_NUM_PERM", 64), cfg.get("LSH_BANDS", 16)
+
+    @classmethod
+    def sketch_of(cls, cells: np.ndarray):
+        """(minhash blob, LSH bucket key per band) for a signature."""
+        num_perm, bands = cls._lsh_settings()
+        sk = sketch(cells, num_perm)
+        return sketch_to_bytes(sk), band_keys(sk, bands)
+
+    @classmethod
+    def best_match(cls, origin_hash: str, dest_hash: str, cells: np.ndarray):
+        """
+        Returns (cluster | None, similarity) for sorted int64 signature cells.
+        ROUTE_MATCH_MODE picks the in-process inverted index ("exact") or
+        MinHash/LSH candidates ("lsh").
+        """
+        if current_app.config.get("ROUTE_MATCH_MODE", "exact") == "lsh":
+            return cls._best_match_lsh(origin_hash, dest_hash, cells)
+        while True:
+            cluster_id, sim = cluster_index.best_match(origin_hash, dest_hash, cells)
+            if cluster_id is None:
+                return None, sim
+            cluster = db.session.get(cls.model, cluster_id)
+            if cluster is not None:
+                return cluster, sim
+            # deleted behind our back; forget it and score again
+            cluster_index.discard(origin_hash, dest_hash, cluster_id)
+
+    @classmethod
+    def _best_match_lsh(cls, origin_hash: str, dest_hash: str, cells: np.ndarray):
+        num_perm, bands = cls._lsh_settings()
+        keys = band_keys(sketch(cells, num_perm), bands)
+        candidates = (cls.model.query
+                      .join(RouteClusterBand, RouteClusterBand.cluster_id == cls.model.id)
+                      .filter(cls.model.origin_hash == origin_hash,
+                              cls.model.dest_hash == dest_hash,
+                              tuple_(RouteClusterBand.band, RouteClusterBand.bucket)
+                              .in_(list(enumerate(keys))))
+                      .distinct()
+                      .order_by(cls.model.id.asc())
+                      .all())
+
+        # exact re-score of the (few) bucket hits
+        best, best_sim = None, 0.0
+        for c in candidates:
+            sim = jaccard_cells(cells, c.signature_cells())
+            if sim > best_sim:
+                best, best_sim = c, sim
+        return best, best_sim
+
+    @classmethod
+    def signature_fields(cls, cells: np.ndarray) -> dict:
+        """
+        Storage columns for a signature. geohashes_json is only written while
+        ROUTE_SIG_WRITE_JSON is on, i.e. until every reader understands geohashes_bin.
+        """
+        blob = cells_to_bytes(cells)
+        out = {"geohashes_bin": blob, "sig_digest": signature_digest(blob)}
+        if current_app.config.get("ROUTE_SIG_WRITE_JSON", True):
+            out["geohashes_json"] = json.dumps(cells_to_geohashes(cells))
+        return out
+
+    @classmethod
+    def _bump_values(cls, n: int, make_normal_at: int):
+        """
+        SET list for an atomic "+n trips" on the existing row. status goes first:
+        MySQL evaluates assignments left to right, so it must still see the old count.
+        """
+        t = cls.model.__table__
+        return [
+            ("status", case((t.c.trips_count + n >= make_normal_at, "NORMAL"), else_=t.c.status)),
+            ("trips_count", t.c.trips_count + n),
+            ("last_seen", func.now()),
+        ]
+
+    @classmethod
+    def increment_count(cls, cluster_id: int, make_normal_at: int = 10, n: int = 1):
+        """
+        Atomic trips_count += n (with NORMAL promotion) in one UPDATE.
+        Returns the (id, trips_count, status) row, or None if it does not exist.
+        Commits.
+        """
+        t = cls.model.__table__
+        res = db.session.execute(
+            update(t).where(t.c.id == cluster_id).ordered_values(*cls._bump_values(n, make_normal_at))
+        )
+        if res.rowcount == 0:
+            db.session.rollback()
+            return None
+        row = db.session.execute(
+            select(t.c.id, t.c.trips_count, t.c.status).where(t.c.id == cluster_id)
+        ).one()
+        db.session.commit()
+        return row
+
+    @classmethod
+    def _lock_od(cls, origin_hash: str, dest_hash: str):
+        """
+        Lock the route_od_lock row of an OD pair (created on first use) until the
+        transaction ends, so only one transaction at a time creates clusters for
+        the pair. Take it before any read of the transaction: the snapshot then
+        starts after the lock and sees clusters committed by the previous holder.
+        """
+        t = RouteOdLock.__table__
+        key = {"origin_hash": origin_hash, "dest_hash": dest_hash}
+        dialect = db.session.get_bind().dialect.name
+        if dialect == "mysql":
+            db.session.execute(mysql_insert(t).values(**key).prefix_with("IGNORE"))
+        elif dialect in ("sqlite", "postgresql"):
+            insert_ = sqlite_insert if dialect == "sqlite" else pg_insert
+            db.session.execute(insert_(t).values(**key).on_conflict_do_nothing())
+        else:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(insert(t).values(**key))
+            except IntegrityError:
+                pass
+        db.session.execute(
+            select(t.c.origin_hash).where(t.c.origin_hash == origin_hash, t.c.dest_hash == dest_hash)
+            .with_for_update()
+        )
+
+    @classmethod
+    def _match_locked(cls, origin_hash: str, dest_hash: str, cells: np.ndarray):
+        """best_match re-run under _lock_od, with the index caught up on the DB first."""
+        if current_app.config.get("ROUTE_MATCH_MODE", "exact") != "lsh":
+            cluster_index.refresh(origin_hash, dest_hash)
+        return cls.best_match(origin_hash, dest_hash, cells)
+
+    @classmethod
+    def _upsert(cls, origin_hash: str, dest_hash: str, cells: np.ndarray, n: int, make_normal_at: int):
+        """
+        Insert a new cluster with trips_count=n, or bump the one that already has
+        this exact signature (uq_cluster_sig). Does not commit.
+        Returns ((id, trips_count, status), created).
+        """
+        t = cls.model.__table__
+        values = {
             "origin_hash": origin_hash,
             "dest_hash": dest_hash,
-            "geohashes_json": json.dumps(geohashes),
-            "trips_count": 1,
-            "status": "UNUSUAL"
-        })
+            "trips_count": n,
+            "status": "NORMAL" if n >= make_normal_at else "UNUSUAL",
+            **cls.signature_fields(cells),
+        }
+        # sketch + band rows only feed the lsh mode; backfill-minhash covers the switch
+        keys = None
+        if current_app.config.get("ROUTE_MATCH_MODE", "exact") == "lsh":
+            values["minhash"], keys = cls.sketch_of(cells)
+        same_sig = (t.c.origin_hash == origin_hash, t.c.dest_hash == dest_hash,
+                    t.c.sig_digest == values["sig_digest"])
+        dialect = db.session.get_bind().dialect.name
+        if dialect == "mysql":
+            # affected rows: 1 = inserted, 2 = existing row updated
+            stmt = mysql_insert(t).values(**values).on_duplicate_key_update(cls._bump_values(n, make_normal_at))
+            created = db.session.execute(stmt).rowcount == 1
+        elif dialect in ("sqlite", "postgresql"):
+            insert_ = sqlite_insert if dialect == "sqlite" else pg_insert
+            stmt = insert_(t).values(**values).on_conflict_do_nothing(
+                index_elements=["origin_hash", "dest_hash", "sig_digest"])
+            created = db.session.execute(stmt).rowcount == 1
+        else:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(insert(t).values(**values))
+                created = True
+            except IntegrityError:
+                created = False
+        if not created and dialect != "mysql":
+            db.session.execute(update(t).where(*same_sig).ordered_values(*cls._bump_values(n, make_normal_at)))
+
+        row = db.session.execute(select(t.c.id, t.c.trips_count, t.c.status).where(*same_sig)).one()
+        if created and keys is not None:
+            db.session.execute(insert(RouteClusterBand.__table__),
+                               [{"cluster_id": row.id, "band": i, "bucket": k} for i, k in enumerate(keys)])
+        return row, created
 
     @classmethod
-    def increment_count(cls, cluster_id: int, make_normal_at: int = 10):
-        c = cls.model.query.get(cluster_id)
-        if not c:
-            return None
-        c.trips_count += 1
-        if c.trips_count >= make_normal_at:
-            c.status = "NORMAL"
+    def _bump(cls, cluster_id: int, n: int, make_normal_at: int):
+        """trips_count += n on an existing cluster. Does not commit."""
+        t = cls.model.__table__
+        db.session.execute(update(t).where(t.c.id == cluster_id)
+                           .ordered_values(*cls._bump_values(n, make_normal_at)))
+        return db.session.execute(select(t.c.id, t.c.trips_count, t.c.status)
+                                  .where(t.c.id == cluster_id)).one()
+
+    @classmethod
+    def create_cluster(cls, origin_hash: str, dest_hash: str, cells: np.ndarray, *,
+                       s_match: float, make_normal_at: int = 10):
+        """
+        Called after best_match found nothing above s_match. Under the OD lock the
+        match is re-run, so a similar cluster a concurrent request just created is
+        joined instead of duplicated. Commits.
+        Returns ((id, trips_count, status), similarity, created).
+        """
+        db.session.commit()   # end the lookup's snapshot; _lock_od starts a fresh one
+        cls._lock_od(origin_hash, dest_hash)
+        cluster, sim = cls._match_locked(origin_hash, dest_hash, cells)
+        if cluster is not None and sim >= s_match:
+            row = cls._bump(cluster.id, 1, make_normal_at)
+            db.session.commit()
+            return row, sim, False
+        row, created = cls._upsert(origin_hash, dest_hash, cells, 1, make_normal_at)
         db.session.commit()
-        return c
+        cluster_index.add(origin_hash, dest_hash, row.id, cells)
+        return row, (sim if created else 1.0), created
+
+    @classmethod
+    def clusterize_many(cls, items, *, s_match: float, make_normal_at: int = 10):
+        """
+        items: [(origin_hash, dest_hash, cells)]. Each route is matched through
+        best_match (index or LSH, same as /clusterize) and against the clusters
+        born earlier in this batch. New clusters are re-checked under their OD
+        locks like create_cluster; all increments/new clusters are applied
+        atomically in one commit.
+        Returns [(cluster_id, similarity, status, trips_count, created)] in input order.
+        """
+        # key is ("id", cluster_id) for existing rows, ("new", n) for clusters born in this batch
+        staged, fresh = [], []
+        born = defaultdict(list)   # (o, d) -> [(key, cells)] of this batch's new clusters
+        for o, d, cells in items:
+            cluster, best_sim = cls.best_match(o, d, cells)
+            best = ("id", cluster.id) if cluster is not None else None
+            for key, other in born[(o, d)]:
+                sim = jaccard_cells(cells, other)
+                if sim > best_sim:
+                    best, best_sim = key, sim
+            if best is None or best_sim < s_match:
+                best = ("new", len(fresh))
+                fresh.append((o, d, cells))
+                born[(o, d)].append((best, cells))
+            staged.append([best, best_sim, cells])
+
+        if fresh:
+            # OD locks first, in a fixed order, then re-match the would-be clusters
+            db.session.commit()
+            for o, d in sorted({(o, d) for o, d, _ in fresh}):
+                cls._lock_od(o, d)
+            joined = {}
+            for i, (o, d, cells) in enumerate(fresh):
+                cluster, sim = cls._match_locked(o, d, cells)
+                if cluster is not None and sim >= s_match:
+                    joined[("new", i)] = (("id", cluster.id), cluster.signature_cells())
+            for entry in staged:
+                if entry[0] in joined:
+                    key, other = joined[entry[0]]
+                    entry[:2] = [key, jaccard_cells(entry[2], other)]
+
+        bumps, nths = defaultdict(int), []
+        for key, _, _ in staged:
+            bumps[key] += 1
+            nths.append(bumps[key])
+
+        final = {}
+        # fixed order (existing ids ascending, then new) so concurrent batches lock rows alike
+        for key, n in sorted(bumps.items()):
+            if key[0] == "id":
+                final[key] = (cls._bump(key[1], n, make_normal_at), False)
+            else:
+                o, d, cells = fresh[key[1]]
+                final[key] = cls._upsert(o, d, cells, n, make_normal_at)
+        db.session.commit()
+
+        for key, (row, created) in final.items():
+            if key[0] == "new":
+                o, d, cells = fresh[key[1]]
+                cluster_index.add(o, d, row.id, cells)
+
+        results = []
+        for (key, sim, _), nth in zip(staged, nths):
+            row, created = final[key]
+            # trips_count as of this item: the final count minus later items of the batch
+            count = row.trips_count - (bumps[key] - nth)
+            status = row.status if count == row.trips_count else ("NORMAL" if count >= make_normal_at else "UNUSUAL")
+            results.append((row.id, sim, status, count, created and nth == 1))
+        return results
 
     @classmethod
     def get_signature(cls, cluster_id: int) -> list[str] | None:
         c = cls.model.query.get(cluster_id)
         if not c:
             return None
-        return json.loads(c.geohashes_json)
+        return cells_to_geohashes(c.signature_cells())
@@ -1,5 +1,13 @@
+import zlib
+from datetime import datetime
+import numpy as np
+from flask import current_app
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.exc import IntegrityError
 from app.services.base_service import BaseService
-from app.models import TripPoint, Trip, db
+from app.models import TripPathArchive, TripPoint, db
+from app.utils.polyline import pack_delta_e6, simplify_dp, unpack_delta_e6
+from app.services.trip_service import FINISHED_STATUSES, TripService
 
 class TripPointService(BaseService):
     model = TripPoint
@@ -7,18 +15,139 @@ class TripPointService(BaseService):
     default_order_dir = "asc"
     filterable_fields = {"trip_id"}
 
+    @staticmethod
+    def owns(trip_id: int, user_id: int) -> bool:
+        """True when the trip exists and belongs to user_id (cached; no query in steady state)."""
+        state = TripService.get_state(trip_id)
+        return state is not None and state.user_id == user_id
+
+    @staticmethod
+    def _writer():
+        return current_app.extensions.get("trip_point_writer")
+
+    @classmethod
+    def _write_behind(cls, writer, rows):
+        return writer.submit(rows, wait=current_app.config.get("TRIP_POINT_WAIT_FLUSH", False),
+                             timeout=current_app.config.get("TRIP_POINT_WAIT_TIMEOUT", 5.0))
+
+    @classmethod
+    def _insert_rows(cls, trip_id: int, rows: list[dict]) -> bool:
+        """
+        Synchronous insert + commit. False when the trip is gone (FK violation):
+        the cached state said otherwise, so it is evicted too.
+        """
+        try:
+            db.session.execute(insert(cls.model), rows)
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            TripService.invalidate_state(trip_id)
+            return False
+        return True
+
     @classmethod
     def append_point(cls, trip_id: int, user_id: int, *, lat: float, lng: float):
-        # ensure trip belongs to user
-        trip = Trip.query.filter_by(id=trip_id, user_id=user_id).first()
-        if not trip:
+        if not cls.owns(trip_id, user_id):
             return None
-        return cls.create({"trip_id": trip_id, "lat": lat, "lng": lng})
+        row = {"trip_id": trip_id, "lat": lat, "lng": lng, "recorded_at": datetime.utcnow()}
+        writer = cls._writer()
+        if writer is not None:
+            cls._write_behind(writer, [row])
+            return row
+        return row if cls._insert_rows(trip_id, [row]) else None
+
+    @classmethod
+    def append_points(cls, trip_id: int, user_id: int, points: list[dict]):
+        """
+        points: [{"lat", "lng", "recorded_at"?}] in client order.
+        One ownership check, one multi-row INSERT, one commit.
+        Returns the number of rows written, or None if the trip is not the user's.
+        """
+        if not cls.owns(trip_id, user_id):
+            return None
+        if not points:
+            return 0
+        now = datetime.utcnow()
+        rows = [{"trip_id": trip_id, "lat": p["lat"], "lng": p["lng"],
+                 "recorded_at": p.get("recorded_at") or now} for p in points]
+        writer = cls._writer()
+        if writer is not None:
+            return cls._write_behind(writer, rows)
+        return len(rows) if cls._insert_rows(trip_id, rows) else None
+
+    @classmethod
+    def iter_path(cls, trip_id: int, chunk_size: int = 2000, upto_id: int | None = None):
+        """
+        (lat, lng) float64 arrays, one chunk at a time: the compacted archive
+        first if the trip has one, then raw trip_point rows. Only the two columns
+        are selected and rows come off a server-side cursor, so no ORM objects are built.
+        """
+        archive = db.session.get(TripPathArchive, trip_id)
+        if archive is not None:
+            yield unpack_delta_e6(zlib.decompress(archive.path_blob))
+
+        # raw rows; after compaction only late (buffered) pings are left here
+        t = cls.model.__table__
+        q = select(t.c.lat, t.c.lng).where(t.c.trip_id == trip_id)
+        if upto_id is not None:
+            q = q.where(t.c.id <= upto_id)
+        result = db.session.execute(
+            q.order_by(t.c.id.asc())
+            .execution_options(yield_per=chunk_size)
+        )
+        for rows in result.partitions():
+            n = len(rows)
+            yield (np.fromiter((r[0] for r in rows), dtype=np.float64, count=n),
+                   np.fromiter((r[1] for r in rows), dtype=np.float64, count=n))
+
+    @classmethod
+    def path_arrays(cls, trip_id: int, upto_id: int | None = None):
+        chunks = list(cls.iter_path(trip_id, upto_id=upto_id))
+        if not chunks:
+            return np.empty(0), np.empty(0)
+        return np.concatenate([c[0] for c in chunks]), np.concatenate([c[1] for c in chunks])
 
     @classmethod
     def get_path(cls, trip_id: int):
-        pts = (cls.model.query
-               .filter_by(trip_id=trip_id)
-               .order_by(cls.model.id.asc())
-               .all())
-        return [(float(p.lat), float(p.lng)) for p in pts]
+        lat, lng = cls.path_arrays(trip_id)
+        return list(zip(lat.tolist(), lng.tolist()))
+
+    @classmethod
+    def compact_path(cls, trip_id: int, tolerance_m: float | None = None):
+        """
+        Simplify the trip's path (archive + raw rows) with Douglas-Peucker into one
+        TripPathArchive blob and delete the raw rows. Commits.
+        Returns the archive, or None if there was nothing to compact or the
+        trip is still active.
+        """
+        state = TripService.get_state(trip_id)
+        if state is None or state.status not in FINISHED_STATUSES:
+            return None
+        if tolerance_m is None:
+            tolerance_m = current_app.config.get("TRIP_COMPACT_TOLERANCE_M", 5.0)
+        t = cls.model.__table__
+        max_id, n_raw, first_at, last_at = db.session.execute(
+            select(func.max(t.c.id), func.count(), func.min(t.c.recorded_at), func.max(t.c.recorded_at))
+            .where(t.c.trip_id == trip_id)
+        ).one()
+        if not n_raw:
+            return None
+
+        lat, lng = cls.path_arrays(trip_id, upto_id=max_id)
+        keep = simplify_dp(lat, lng, tolerance_m)
+        blob = zlib.compress(pack_delta_e6(lat[keep], lng[keep]), 9)
+
+        archive = db.session.get(TripPathArchive, trip_id)
+        if archive is None:
+            archive = TripPathArchive(trip_id=trip_id, raw_points=0, first_recorded_at=first_at)
+            db.session.add(archive)
+        archive.path_blob = blob
+        archive.raw_points += n_raw
+        archive.kept_points = int(keep.size)
+        archive.tolerance_m = tolerance_m
+        archive.last_recorded_at = last_at
+        archive.compacted_at = func.now()
+        # rows that land after max_id stay raw until the next run
+        db.session.execute(delete(t).where(t.c.trip_id == trip_id, t.c.id <= max_id))
+        db.session.commit()
+        return archive
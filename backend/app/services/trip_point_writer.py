@@ -0,0 +1,224 @@
+# app/services/trip_point_writer.py
+"""
+Write-behind buffer for TripPoint rows (TRIP_POINT_WRITE_MODE=buffered).
+
+Pings are queued in-process and a background thread writes them with one
+executemany INSERT + commit every TRIP_POINT_FLUSH_MS or TRIP_POINT_FLUSH_ROWS,
+whichever comes first. With TRIP_POINT_WAIT_FLUSH the caller blocks until its
+rows are committed (group commit); without it the ping returns right away and a
+crash can lose up to one flush window of points.
+
+A failed flush is not dropped wholesale: a connection-level error
+(OperationalError, lost connection) puts the rows back at the head of the queue
+for up to TRIP_POINT_FLUSH_RETRIES more attempts, with backoff; any other error
+re-runs the batch one submit() at a time, then row by row inside the failing
+chunk, so only the rows that actually fail (e.g. a deleted trip's) are lost.
+"""
+import atexit
+import logging
+import threading
+import time
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DisconnectionError, InterfaceError, OperationalError
+
+from app.models import TripPoint, db
+
+log = logging.getLogger(__name__)
+
+
+class TripPointQueueFull(Exception):
+    """The buffer is at TRIP_POINT_QUEUE_MAX rows; the caller should back off."""
+
+
+class TripPointFlushError(Exception):
+    """The flush carrying these rows failed (only raised when waiting for it)."""
+
+
+def _is_transient(exc) -> bool:
+    return (isinstance(exc, (OperationalError, InterfaceError, DisconnectionError))
+            or getattr(exc, "connection_invalidated", False))
+
+
+class _Ticket:
+    __slots__ = ("done", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.error = None
+
+
+class TripPointWriter:
+    def __init__(self, app, *, max_rows=10000, flush_ms=200, flush_rows=500, retries=3):
+        self.app = app
+        self.max_rows = max_rows
+        self.flush_s = flush_ms / 1000.0
+        self.flush_rows = flush_rows
+        self.retries = retries
+
+        self._cond = threading.Condition()
+        self._buf = []          # [(rows, ticket | None, attempts)]
+        self._pending = 0       # rows in _buf
+        self._stopping = False
+
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.failed_rows = 0
+        self.retried_rows = 0
+        self.rejected_rows = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+
+        self._thread = threading.Thread(target=self._run, name="trip-point-writer", daemon=True)
+        self._thread.start()
+
+    # ---- producer side ----
+    def submit(self, rows: list[dict], wait: bool = False, timeout: float | None = None):
+        ticket = _Ticket() if wait else None
+        with self._cond:
+            if self._stopping:
+                raise TripPointQueueFull("writer is shutting down")
+            if self._pending + len(rows) > self.max_rows:
+                self.rejected_rows += len(rows)
+                raise TripPointQueueFull(f"{self._pending} rows queued")
+            self._buf.append((rows, ticket, 0))
+            self._pending += len(rows)
+            self._cond.notify()
+        if ticket is not None:
+            if not ticket.done.wait(timeout):
+                raise TripPointFlushError("timed out waiting for flush")
+            if ticket.error is not None:
+                raise TripPointFlushError(str(ticket.error))
+        return len(rows)
+
+    # ---- flusher ----
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._buf and not self._stopping:
+                    self._cond.wait()
+                if not self._buf:
+                    return
+                # group commit window opens with the first queued ping
+                deadline = time.monotonic() + self.flush_s
+                while self._pending < self.flush_rows and not self._stopping:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch, self._buf, self._pending = self._buf, [], 0
+            backoff = self._flush(batch)
+            if backoff:
+                time.sleep(backoff)
+
+    def _insert(self, rows):
+        """One INSERT + commit; returns the exception instead of raising."""
+        try:
+            db.session.execute(insert(TripPoint), rows)
+            db.session.commit()
+            return None
+        except Exception as e:
+            db.session.rollback()
+            return e
+
+    def _write_chunk(self, rows):
+        """
+        Rows of one submit(); row by row if the chunk as a whole fails.
+        Returns (written, rows to retry, last error).
+        """
+        err = self._insert(rows)
+        if err is None:
+            return len(rows), [], None
+        if _is_transient(err):
+            return 0, rows, err
+        if len(rows) == 1:
+            return 0, [], err
+        written, last = 0, err
+        for i, row in enumerate(rows):
+            e = self._insert([row])
+            if e is None:
+                written += 1
+            elif _is_transient(e):
+                return written, rows[i:], e
+            else:
+                last = e
+        return written, [], last
+
+    def _flush(self, batch):
+        """Write a batch; returns the backoff (seconds) before the next flush, 0 if none."""
+        t0 = time.perf_counter()
+        results = []   # (entry, written, retry rows, error)
+        with self.app.app_context():
+            try:
+                err = self._insert([r for rows, _, _ in batch for r in rows])
+                if err is None:
+                    results = [(e, len(e[0]), [], None) for e in batch]
+                elif _is_transient(err):
+                    results = [(e, 0, e[0], err) for e in batch]
+                else:
+                    log.warning("trip point flush failed (%s); retrying per chunk", err)
+                    results = [(e, *self._write_chunk(e[0])) for e in batch]
+            finally:
+                db.session.remove()
+        ms = (time.perf_counter() - t0) * 1000.0
+
+        requeue, backoff = [], 0.0
+        for (rows, ticket, attempts), written, retry, error in results:
+            self.flushed_rows += written
+            failed = len(rows) - written - len(retry)
+            if retry and attempts < self.retries:
+                requeue.append((retry, ticket, attempts + 1))
+                self.retried_rows += len(retry)
+                backoff = max(backoff, min(self.flush_s * 2 ** attempts, 5.0))
+            else:
+                failed += len(retry)
+            if failed:
+                self.failed_rows += failed
+                log.error("dropped %d trip point rows (trip %s): %s", failed, rows[0].get("trip_id"), error)
+            if ticket is not None and not (retry and attempts < self.retries):
+                ticket.error = error if failed else None
+                ticket.done.set()
+
+        self.flushes += 1
+        self.last_flush_ms = ms
+        self.max_flush_ms = max(self.max_flush_ms, ms)
+        if requeue:
+            with self._cond:
+                self._buf[:0] = requeue
+                self._pending += sum(len(r) for r, _, _ in requeue)
+        return backoff
+
+    # ---- lifecycle ----
+    def drain(self, timeout: float = 10.0):
+        """Flush whatever is queued and stop the thread (runs at interpreter exit)."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._pending,
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+            "failed_rows": self.failed_rows,
+            "retried_rows": self.retried_rows,
+            "rejected_rows": self.rejected_rows,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "max_flush_ms": round(self.max_flush_ms, 3),
+        }
+
+
+def init_trip_point_writer(app):
+    if app.config.get("TRIP_POINT_WRITE_MODE", "sync") != "buffered":
+        return None
+    writer = TripPointWriter(
+        app,
+        max_rows=app.config.get("TRIP_POINT_QUEUE_MAX", 10000),
+        flush_ms=app.config.get("TRIP_POINT_FLUSH_MS", 200),
+        flush_rows=app.config.get("TRIP_POINT_FLUSH_ROWS", 500),
+        retries=app.config.get("TRIP_POINT_FLUSH_RETRIES", 3),
+    )
+    app.extensions["trip_point_writer"] = writer
+    atexit.register(writer.drain)
+    return writer
@@ -1,5 +1,27 @@
+from collections import namedtuple
+from datetime import datetime
+from flask import current_app
 from app.services.user_scoped_service import UserScopedService
 from app.models import Trip, db
+from app.utils.cache import TTLCache
+
+# what the ping path needs to know about a running trip
+TripState = namedtuple("TripState", "user_id status cluster_id cluster_sim risk_level")
+
+FINISHED_STATUSES = ("COMPLETED", "CANCELLED")
+
+
+
+def _trip_state_cache():
+    # one cache per app: trip ids of two apps in one process (tests, CLI) must not mix
+    cache = current_app.extensions.get("trip_state_cache")
+    if cache is None:
+        cfg = current_app.config
+        cache = current_app.extensions.setdefault(
+            "trip_state_cache", TTLCache(maxsize=cfg.get("TRIP_STATE_CACHE_SIZE", 10000),
+                                         ttl=cfg.get("TRIP_STATE_TTL_SEC", 10.0)))
+    return cache
+
 
 class TripService(UserScopedService):
     model = Trip
@@ -7,6 +29,44 @@ class TripService(UserScopedService):
     default_order_dir = "desc"
     filterable_fields = {"mode", "status", "risk_level", "cluster_id"}
 
+    @classmethod
+    def get_state(cls, trip_id: int) -> TripState | None:
+        """
+        Owner/status/cluster/risk of a trip from the app's TTL cache.
+        Writes through this service invalidate it; writes from other workers
+        become visible within TRIP_STATE_TTL_SEC.
+        """
+        cache = _trip_state_cache()
+        state = cache.get(trip_id)
+        if state is None:
+            m = cls.model
+            row = (db.session.query(m.user_id, m.status, m.cluster_id, m.cluster_sim, m.risk_level)
+                   .filter(m.id == trip_id)
+                   .first())
+            if row is None:
+                return None
+            state = TripState(row.user_id, row.status, row.cluster_id,
+                              float(row.cluster_sim) if row.cluster_sim is not None else None,
+                              row.risk_level)
+            cache.set(trip_id, state)
+        return state
+
+    @classmethod
+    def invalidate_state(cls, trip_id: int):
+        _trip_state_cache().pop(trip_id)
+
+    @classmethod
+    def update(cls, id_, data, user_id):
+        trip = super().update(id_, data, user_id)
+        cls.invalidate_state(id_)
+        return trip
+
+    @classmethod
+    def delete(cls, id_, user_id):
+        deleted = super().delete(id_, user_id)
+        cls.invalidate_state(id_)
+        return deleted
+
     @classmethod
     def create_trip(cls, user_id: int, *, origin_lat, origin_lng, dest_lat, dest_lng,
                     mode, route_polyline, eta_sec, distance_m):
@@ -27,9 +87,12 @@ class TripService(UserScopedService):
         if not trip:
             return None
         trip.status = status
+        if status in FINISHED_STATUSES and trip.ended_at is None:
+            trip.ended_at = datetime.utcnow()
         if risk_level:
             trip.risk_level = risk_level
         db.session.commit()
+        cls.invalidate_state(trip_id)
         return trip
 
     @classmethod
@@ -40,6 +103,7 @@ class TripService(UserScopedService):
         trip.cluster_id = cluster_id
         trip.cluster_sim = round(float(similarity), 3)
         db.session.commit()
+        cls.invalidate_state(trip_id)
         return trip
 
     @classmethod
@@ -51,4 +115,5 @@ class TripService(UserScopedService):
         if alert_sent is not None:
             trip.alert_sent = alert_sent
         db.session.commit()
+        cls.invalidate_state(trip_id)
         return trip
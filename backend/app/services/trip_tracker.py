@@ -0,0 +1,248 @@
+# app/services/trip_tracker.py
+"""
+Live route-deviation detection and trip progress.
+
+The planned route_polyline of a trip is decoded once into local metric
+coordinates plus a uniform grid of segments. Each tracker keeps a cursor on the
+last matched segment, so a ping normally only looks at a handful of segments
+ahead of it; the grid is the fallback when the vehicle skipped ahead or left the
+route. After DEVIATION_SUSTAIN_PINGS consecutive off-route pings the trip's
+risk_level is raised to RISKY through TripService.set_risk.
+
+The same projection drives progress: a cumulative-distance array along the
+planned route turns (segment, ratio) into metres covered, from which remaining
+distance and a remaining ETA (planned pace: eta_sec * remaining share) follow.
+
+Trackers live in a per-app, per-process TTL cache; with several workers each one sees
+only the pings routed to it, which can delay (not prevent) detection.
+"""
+import logging
+import math
+import threading
+from collections import defaultdict
+
+import numpy as np
+from flask import current_app
+
+from app.models import Trip, db
+from app.services.trip_service import FINISHED_STATUSES, TripService
+from app.utils.cache import TTLCache
+from app.utils.polyline import EARTH_R, decode_polyline_np, segment_lengths
+
+log = logging.getLogger(__name__)
+
+_trackers_lock = threading.Lock()
+
+
+class PlannedRoute:
+    def __init__(self, lat, lng, cell_m, *, eta_sec=None, distance_m=None):
+        self.lat0 = float(lat[0]) if lat.size else 0.0
+        self.lng0 = float(lng[0]) if lng.size else 0.0
+        self._kx = EARTH_R * math.cos(math.radians(self.lat0)) * math.pi / 180.0
+        self._ky = EARTH_R * math.pi / 180.0
+        x, y = self.to_xy(lat, lng)
+        if x.size == 1:
+            x, y = np.repeat(x, 2), np.repeat(y, 2)
+        self.ax, self.ay = x[:-1], y[:-1]
+        self.dx, self.dy = x[1:] - x[:-1], y[1:] - y[:-1]
+        self.len2 = self.dx ** 2 + self.dy ** 2
+        self.n = self.ax.size
+
+        # metres along the route at the start of each segment (+ total at the end)
+        seg = segment_lengths(lat, lng) if lat.size > 1 else np.zeros(1)
+        self.cum = np.concatenate(([0.0], np.cumsum(seg)))
+        self.seg_m = seg
+        self.total_m = float(self.cum[-1])
+        self.eta_sec = eta_sec
+        self.distance_m = distance_m if distance_m else self.total_m
+
+        # walk each segment in cell_m/2 steps and register the cells it crosses plus their
+        # neighbours; a diagonal segment no longer claims its whole bounding box
+        self.cell_m = cell_m
+        self.grid = defaultdict(list)
+        step = cell_m / 2.0
+        for i in range(self.n):
+            k = max(1, int(math.ceil(math.sqrt(self.len2[i]) / step)))
+            t = np.linspace(0.0, 1.0, k + 1)
+            cx = np.floor((self.ax[i] + t * self.dx[i]) / cell_m).astype(np.int64)
+            cy = np.floor((self.ay[i] + t * self.dy[i]) / cell_m).astype(np.int64)
+            cells = set()
+            for a, b in set(zip(cx.tolist(), cy.tolist())):
+                cells.update((a + da, b + db) for da in (-1, 0, 1) for db in (-1, 0, 1))
+            for cell in cells:
+                self.grid[cell].append(i)
+
+    @classmethod
+    def from_polyline(cls, encoded, cell_m, **plan):
+        lat, lng = decode_polyline_np(encoded)
+        if lat.size == 0:
+            return None
+        return cls(lat, lng, cell_m, **plan)
+
+    def along(self, seg, ratio) -> float:
+        return float(self.cum[seg] + ratio * self.seg_m[seg])
+
+    def to_xy(self, lat, lng):
+        return (np.asarray(lng) - self.lng0) * self._kx, (np.asarray(lat) - self.lat0) * self._ky
+
+    def distances(self, idx, px, py):
+        """Distance (m) from (px, py) to each segment in idx, and the projection ratio."""
+        t = ((px - self.ax[idx]) * self.dx[idx] + (py - self.ay[idx]) * self.dy[idx]) / np.maximum(self.len2[idx], 1e-9)
+        t = np.clip(t, 0.0, 1.0)
+        qx = self.ax[idx] + t * self.dx[idx]
+        qy = self.ay[idx] + t * self.dy[idx]
+        return np.hypot(px - qx, py - qy), t
+
+    def near(self, px, py, radius_m):
+        """Segment indices in grid cells within radius_m of the point."""
+        r = int(math.ceil(radius_m / self.cell_m))
+        cx, cy = int(px // self.cell_m), int(py // self.cell_m)
+        out = set()
+        for i in range(cx - r, cx + r + 1):
+            for j in range(cy - r, cy + r + 1):
+                out.update(self.grid.get((i, j), ()))
+        return np.fromiter(out, dtype=np.int64, count=len(out))
+
+
+class TripTracker:
+    def __init__(self, route: PlannedRoute, *, threshold_m, sustain, window):
+        self.route = route
+        self.threshold_m = threshold_m
+        self.sustain = sustain
+        self.window = window
+        self.cursor = 0
+        self.covered_m = 0.0
+        self.off_streak = 0
+        self.flagged = False
+        self.lock = threading.Lock()
+
+    def _match(self, px, py):
+        """(segment, ratio, distance) of the best match; windowed first, grid second."""
+        route = self.route
+        lo = max(0, self.cursor - 1)
+        idx = np.arange(lo, min(route.n, self.cursor + self.window + 1))
+        d, t = route.distances(idx, px, py)
+        k = int(np.argmin(d))
+        best = (int(idx[k]), float(t[k]), float(d[k]))
+        if best[2] <= self.threshold_m:
+            return best
+
+        idx = route.near(px, py, self.threshold_m)
+        if idx.size:
+            d, t = route.distances(idx, px, py)
+            k = int(np.argmin(d))
+            if d[k] < best[2]:
+                best = (int(idx[k]), float(t[k]), float(d[k]))
+        return best
+
+    def update(self, lat, lng) -> dict:
+        px, py = self.route.to_xy(lat, lng)
+        seg, ratio, dist = self._match(float(px), float(py))
+        on_route = dist <= self.threshold_m
+        if on_route:
+            self.cursor = seg
+            self.covered_m = self.route.along(seg, ratio)
+            self.off_streak = 0
+        else:
+            self.off_streak += 1
+        raise_risk = not self.flagged and self.off_streak >= self.sustain
+        if raise_risk:
+            self.flagged = True
+        return {"on_route": on_route, "deviation_m": round(dist, 1), "raise_risk": raise_risk,
+                **self.progress()}
+
+    def progress(self) -> dict:
+        route = self.route
+        share = self.covered_m / route.total_m if route.total_m > 0 else 1.0
+        remaining = route.distance_m * (1.0 - share)
+        out = {
+            "covered_m": round(route.distance_m * share),
+            "remaining_m": round(remaining),
+            "progress": round(share, 4),
+        }
+        if route.eta_sec is not None:
+            out["eta_remaining_sec"] = round(route.eta_sec * (1.0 - share))
+        return out
+
+
+def _tracker_cache():
+    cache = current_app.extensions.get("trip_trackers")
+    if cache is None:
+        cfg = current_app.config
+        # sliding: a trip that keeps pinging keeps its tracker (and cursor) past the TTL
+        cache = current_app.extensions.setdefault(
+            "trip_trackers", TTLCache(maxsize=cfg.get("TRACKER_CACHE_SIZE", 5000),
+                                      ttl=cfg.get("TRACKER_TTL_SEC", 3600.0), sliding=True))
+    return cache
+
+
+def _build_tracker(route_polyline, eta_sec, distance_m) -> TripTracker | None:
+    cfg = current_app.config
+    threshold = cfg.get("DEVIATION_THRESHOLD_M", 75.0)
+    if not route_polyline:
+        return None
+    try:
+        route = PlannedRoute.from_polyline(route_polyline, cell_m=max(threshold, 50.0),
+                                           eta_sec=eta_sec, distance_m=distance_m)
+    except (ValueError, TypeError, AttributeError, IndexError) as exc:
+        # an undecodable route_polyline just means no deviation tracking for the trip
+        log.warning("route_polyline not decodable, no tracker: %s", exc)
+        return None
+    if route is None:
+        return None
+    return TripTracker(route, threshold_m=threshold,
+                       sustain=cfg.get("DEVIATION_SUSTAIN_PINGS", 3),
+                       window=cfg.get("DEVIATION_WINDOW", 8))
+
+
+def warm_tracker(trip_id: int):
+    """Precompute the route model right after the trip is created."""
+    get_tracker(trip_id)
+
+
+def get_tracker(trip_id: int) -> TripTracker | None:
+    cache = _tracker_cache()
+    tracker = cache.get(trip_id)
+    if tracker is not None:
+        return tracker
+    with _trackers_lock:
+        tracker = cache.get(trip_id)
+        if tracker is None:
+            row = (db.session.query(Trip.route_polyline, Trip.eta_sec, Trip.distance_m)
+                   .filter(Trip.id == trip_id)
+                   .first())
+            tracker = _build_tracker(*row) if row else None
+            if tracker is None:
+                return None
+            cache.set(trip_id, tracker)
+    return tracker
+
+
+def drop_tracker(trip_id: int):
+    cache = current_app.extensions.get("trip_trackers")
+    if cache is not None:
+        cache.pop(trip_id)
+
+
+def track_points(trip_id: int, user_id: int, points) -> dict | None:
+    """
+    Feed (lat, lng) pings in order; returns the result for the last one.
+    Raises the trip to RISKY once the deviation has been sustained.
+    """
+    state = TripService.get_state(trip_id)
+    if state is None or state.status in FINISHED_STATUSES:
+        return None
+    tracker = get_tracker(trip_id)
+    if tracker is None:
+        return None
+    result = None
+    raise_risk = False
+    with tracker.lock:
+        if state.risk_level == "RISKY":
+            tracker.flagged = True
+        for lat, lng in points:
+            result = tracker.update(lat, lng)
+            raise_risk = raise_risk or result["raise_risk"]
+    if raise_risk:
+        TripService.set_risk(trip_id, user_id, risk_level="RISKY")
+    return result
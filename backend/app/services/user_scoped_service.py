@@ -28,11 +28,7 @@ class UserScopedService(BaseService):
         return ranges.get(range_key, None)
     
     @classmethod
-    def list_scoped(cls, user_id, *, range_key="all", tz_offset=0,
-                    filters=None, order_by=None, order_dir=None, limit=None, offset=None):
-        """
-        Returns (items, total) scoped by user_id, optional date range, filters, and pagination.
-        """
+    def _scoped_query(cls, user_id, range_key="all", tz_offset=0, filters=None):
         q = cls.model.query.filter_by(user_id=user_id)
 
         since = cls._get_time_threshold(range_key, tz_offset)
@@ -47,28 +43,50 @@ class UserScopedService(BaseService):
                 if cls._allowed_field(k):
                     base_filters[k] = v
 
-        q = cls._apply_filters(q, base_filters)
-        total = q.count()
+        return cls._apply_filters(q, base_filters)
 
-        q = cls._apply_ordering(q, order_by, order_dir)
-        q = cls._apply_pagination(q, limit, offset)
-        return q.all(), total
+    @classmethod
+    def list_scoped_version(cls, user_id, *, range_key="all", tz_offset=0, filters=None) -> str:
+        return cls._version_of(cls._scoped_query(user_id, range_key, tz_offset, filters))
 
+    @classmethod
+    def item_version(cls, id_, user_id) -> str:
+        return cls._version_of(cls.model.query.filter_by(id=id_, user_id=user_id))
 
     @classmethod
-    def get_last_scoped(cls, user_id, *, range_key="all", tz_offset=0, filters=None, order_by=None, order_dir=None):
-        q = cls.model.query.filter_by(user_id=user_id)
+    def ids_scoped_version(cls, ids, user_id) -> str:
+        return cls._version_of(cls.model.query.filter_by(user_id=user_id).filter(cls.model.id.in_(ids)))
 
-        since = cls._get_time_threshold(range_key, tz_offset)
-        if since is not None and hasattr(cls.model, "date"):
-            q = q.filter(cls.model.date >= since)
+    @classmethod
+    def get_many_by_ids_scoped(cls, ids, user_id, fields=None):
+        """get_many_by_ids (request order, chunked) limited to the user's rows."""
+        return cls.get_many_by_ids(ids, preserve_order=True, fields=fields,
+                                   query=cls.model.query.filter_by(user_id=user_id))
 
-        base_filters = {}
-        if filters:
-            for k, v in filters.items():
-                if cls._allowed_field(k):
-                    base_filters[k] = v
-        q = cls._apply_filters(q, base_filters)
+    @classmethod
+    def list_scoped(cls, user_id, *, range_key="all", tz_offset=0,
+                    filters=None, order_by=None, order_dir=None, limit=None, offset=None,
+                    cursor=None, with_total=True, fields=None):
+        """
+        Returns (items, total) scoped by user_id, optional date range, filters, and pagination.
+        cursor/with_total/fields work as in BaseService.list.
+        """
+        q = cls._scoped_query(user_id, range_key, tz_offset, filters)
+        total = q.count() if with_total else None
+
+        q = cls._apply_fields(q, fields, cls._resolve_ordering(order_by, order_dir)[0])
+        if cursor:
+            q = cls._apply_cursor(q, cursor, order_by, order_dir)
+        q = cls._apply_ordering(q, order_by, order_dir, tiebreak=cursor is not None)
+        q = cls._apply_pagination(q, limit, None if cursor is not None else offset)
+        return q.all(), total
+
+
+    @classmethod
+    def get_last_scoped(cls, user_id, *, range_key="all", tz_offset=0, filters=None, order_by=None, order_dir=None,
+                        fields=None):
+        q = cls._scoped_query(user_id, range_key, tz_offset, filters)
+        q = cls._apply_fields(q, fields)
         q = cls._apply_ordering(q, order_by, order_dir)
         return q.first()
     
@@ -83,8 +101,8 @@ class UserScopedService(BaseService):
         return query.all()
 
     @classmethod
-    def get_by_id(cls, id_, user_id):
-        return cls.model.query.filter_by(id=id_, user_id=user_id).first()
+    def get_by_id(cls, id_, user_id, fields=None):
+        return cls._apply_fields(cls.model.query, fields).filter_by(id=id_, user_id=user_id).first()
 
     @classmethod
     def create(cls, data, user_id):
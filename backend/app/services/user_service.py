@@ -1,12 +1,24 @@
 from app.models import User, UserInformation, db
 from .base_service import BaseService
-from werkzeug.security import generate_password_hash
+from sqlalchemy import func
+from sqlalchemy.orm import selectinload
+from app.services.password_hasher import hash_password
 from flask import jsonify
 
 
 class UserService(BaseService):
     model = User
+    # to_dict embeds user_information: one IN query per page instead of one per user
+    default_load_options = (selectinload(User.user_information),)
 
+    @classmethod
+    def _version_of(cls, query) -> str:
+        # to_dict embeds user_information, so its edits must change the version too
+        info = (query.join(UserInformation, UserInformation.user_id == User.id)
+                .with_entities(func.max(UserInformation.updated_at))
+                .order_by(None)
+                .scalar())
+        return f"{super()._version_of(query)}:{info or ''}"
 
     @classmethod
     def create(cls, data):
@@ -15,7 +27,7 @@ class UserService(BaseService):
             raise ValueError("Missing 'info' key with user information data")
 
         # Hash password
-        data['password'] = generate_password_hash(data['password'])
+        data['password'] = hash_password(data['password'])
         
         # Create user first
         user = cls.model(**data)
@@ -0,0 +1,47 @@
+# app/utils/cursor.py
+"""
+Opaque keyset-pagination cursors: urlsafe base64 of a small JSON document
+holding the ordering (column, direction) and the last (value, id) seen.
+"""
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+
+def _dump_value(val):
+    if isinstance(val, datetime):
+        return {"dt": val.isoformat()}
+    if isinstance(val, date):
+        return {"d": val.isoformat()}
+    if isinstance(val, Decimal):
+        return {"dec": str(val)}
+    return val
+
+
+def _load_value(val):
+    if isinstance(val, dict):
+        if "dt" in val:
+            return datetime.fromisoformat(val["dt"])
+        if "d" in val:
+            return date.fromisoformat(val["d"])
+        if "dec" in val:
+            return Decimal(val["dec"])
+        raise ValueError("bad cursor value")
+    return val
+
+
+def encode_cursor(order_by: str, order_dir: str, value, id_) -> str:
+    doc = {"o": order_by, "d": order_dir, "v": _dump_value(value), "i": id_}
+    raw = json.dumps(doc, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(token: str) -> dict:
+    """-> {"order_by", "order_dir", "value", "id"}; ValueError if the token is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        doc = json.loads(raw)
+        return {"order_by": doc["o"], "order_dir": doc["d"], "value": _load_value(doc["v"]), "id": doc["i"]}
+    except Exception:
+        raise ValueError("invalid cursor") from None
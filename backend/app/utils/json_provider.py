@@ -0,0 +1,44 @@
+# app/utils/json_provider.py
+"""
+orjson-backed Flask JSON provider (JSON_ENCODER=orjson, the default when the
+package is installed). Output matches Flask's default provider: sorted keys,
+and anything orjson does not handle natively (Decimal, datetime, ...) goes
+through DefaultJSONProvider.default.
+"""
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except Exception:
+    HAS_ORJSON = False
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    _options = 0
+    if HAS_ORJSON:
+        _options = (orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+                    | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_SERIALIZE_NUMPY)
+
+    def dumps_bytes(self, obj) -> bytes:
+        return orjson.dumps(obj, default=self.default, option=self._options)
+
+    def dumps(self, obj, **kwargs) -> str:
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj), mimetype=self.mimetype)
+
+
+def init_json(app):
+    if app.config.get("JSON_ENCODER", "orjson") == "orjson" and HAS_ORJSON:
+        app.json = OrjsonProvider(app)
+    return app.json
@@ -1,11 +1,17 @@
+import hashlib
+import time
 import jwt
 from functools import wraps
 from flask import request, jsonify
 from datetime import datetime, timedelta
 from app.config import Config
+from app.utils.cache import TTLCache
 
 SECRET_KEY = Config.SECRET_KEY
 
+# sha256(token) -> claims of tokens that already passed verification
+_token_cache = TTLCache(maxsize=Config.TOKEN_CACHE_SIZE, ttl=Config.TOKEN_CACHE_TTL_SEC)
+
 def generate_token(user):
     payload = {
         "user_id": user.id,
@@ -15,6 +21,30 @@ def generate_token(user):
     }
     return jwt.encode(payload, SECRET_KEY, algorithm="HS256")
 
+def verify_token(token: str) -> dict:
+    """
+    Claims of a valid token; raises jwt.InvalidTokenError like jwt.decode.
+    Verified tokens are cached until their exp (at most TOKEN_CACHE_TTL_SEC).
+    """
+    if _token_cache.maxsize <= 0:
+        return jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+    key = hashlib.sha256(token.encode()).digest()
+    data = _token_cache.get(key)
+    if data is not None:
+        return dict(data)
+    data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+    ttl = _token_cache.ttl
+    if "exp" in data:
+        ttl = min(ttl, data["exp"] - time.time())
+    if ttl > 0:
+        _token_cache.set(key, data, ttl=ttl)
+    return dict(data)
+
+
+def token_cache_stats() -> dict:
+    return _token_cache.stats()
+
+
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
@@ -26,8 +56,7 @@ def token_required(f):
         if not token:
             return jsonify({"error": "Token is missing"}), 401
         try:
-            data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-            request.user = data
+            request.user = verify_token(token)
         except jwt.ExpiredSignatureError:
             return jsonify({"error": "Token expired"}), 401
         except jwt.InvalidTokenError:
@@ -0,0 +1,207 @@
+# app/utils/metrics.py
+"""
+In-process request metrics, exposed in Prometheus text format at /metrics.
+
+- http_request_duration_seconds{endpoint,method}: latency histogram per Flask endpoint
+- http_requests_total{endpoint,method,status}
+- db_statements_total / db_time_seconds_total{endpoint}: counted with engine
+  cursor events and attributed to the request that ran them
+- db_pool_checkouts_total / db_pool_connects_total: pool checkouts and new DBAPI
+  connections, from the pool's checkout/connect events
+- app_<component>_<stat>: gauges from the caches/buffers (stats() sources)
+
+Numbers are per process; with several workers, scrape each one or sum them.
+The endpoint only exists when METRICS_TOKEN is set, and needs
+"Authorization: Bearer <token>".
+"""
+import hmac
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "total", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)   # last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def lines(self, name, labels=""):
+        sep = "," if labels else ""
+        acc = 0
+        for le, n in zip(self.buckets, self.counts):
+            acc += n
+            yield f'{name}_bucket{{{labels}{sep}le="{le}"}} {acc}'
+        yield f'{name}_bucket{{{labels}{sep}le="+Inf"}} {self.count}'
+        yield f"{name}_sum{{{labels}}} {self.total:.6f}" if labels else f"{name}_sum {self.total:.6f}"
+        yield f"{name}_count{{{labels}}} {self.count}" if labels else f"{name}_count {self.count}"
+
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency = defaultdict(lambda: Histogram(LATENCY_BUCKETS))   # (endpoint, method)
+        self.requests = defaultdict(int)                                  # (endpoint, method, status)
+        self.db_statements = defaultdict(int)                             # endpoint
+        self.db_time = defaultdict(float)
+        self.pool_checkouts = 0
+        self.pool_connects = 0
+        self.sources = {}                                                 # name -> () -> dict | None
+        self.engine = None
+
+    def record_request(self, endpoint, method, status, seconds, n_sql, sql_s):
+        with self.lock:
+            self.latency[(endpoint, method)].observe(seconds)
+            self.requests[(endpoint, method, status)] += 1
+            if n_sql:
+                self.db_statements[endpoint] += n_sql
+                self.db_time[endpoint] += sql_s
+
+    def record_pool(self, checkouts=0, connects=0):
+        with self.lock:
+            self.pool_checkouts += checkouts
+            self.pool_connects += connects
+
+    def render(self) -> str:
+        out = []
+        with self.lock:
+            out.append("# TYPE http_request_duration_seconds histogram")
+            for (ep, method), h in sorted(self.latency.items()):
+                out.extend(h.lines("http_request_duration_seconds", f'endpoint="{ep}",method="{method}"'))
+            out.append("# TYPE http_requests_total counter")
+            for (ep, method, status), n in sorted(self.requests.items()):
+                out.append(f'http_requests_total{{endpoint="{ep}",method="{method}",status="{status}"}} {n}')
+            out.append("# TYPE db_statements_total counter")
+            for ep, n in sorted(self.db_statements.items()):
+                out.append(f'db_statements_total{{endpoint="{ep}"}} {n}')
+            out.append("# TYPE db_time_seconds_total counter")
+            for ep, s in sorted(self.db_time.items()):
+                out.append(f'db_time_seconds_total{{endpoint="{ep}"}} {s:.6f}')
+            out.append("# TYPE db_pool_checkouts_total counter")
+            out.append(f"db_pool_checkouts_total {self.pool_checkouts}")
+            out.append("# TYPE db_pool_connects_total counter")
+            out.append(f"db_pool_connects_total {self.pool_connects}")
+
+        pool = self.engine.pool if self.engine is not None else None
+        for name in ("size", "checkedout", "overflow", "checkedin"):
+            fn = getattr(pool, name, None)
+            if callable(fn):
+                out.append(f"# TYPE db_pool_{name} gauge")
+                out.append(f"db_pool_{name} {fn()}")
+
+        for source, fn in sorted(self.sources.items()):
+            try:
+                stats = fn()
+            except Exception:
+                continue
+            for key, val in sorted((stats or {}).items()):
+                if isinstance(val, (int, float)) and not isinstance(val, bool):
+                    out.append(f"app_{source}_{key} {val}")
+        return "\n".join(out) + "\n"
+
+
+def _instrument_engine(metrics, engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def _sql_start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_metrics_t0", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _sql_end(conn, cursor, statement, parameters, context, executemany):
+        stack = conn.info.get("_metrics_t0")
+        if not stack:
+            return
+        dt = time.perf_counter() - stack.pop()
+        if has_request_context():
+            g._metrics_sql_n = g.get("_metrics_sql_n", 0) + 1
+            g._metrics_sql_s = g.get("_metrics_sql_s", 0.0) + dt
+
+    # connects climbing with checkouts means the pool keeps opening fresh connections
+    @event.listens_for(engine, "checkout")
+    def _pool_checkout(dbapi_conn, record, proxy):
+        metrics.record_pool(checkouts=1)
+
+    @event.listens_for(engine, "connect")
+    def _pool_connect(dbapi_conn, record):
+        metrics.record_pool(connects=1)
+
+
+def add_stats_source(app, name, fn):
+    """Export the numeric values of fn() (a stats() dict) as app_<name>_<key> gauges."""
+    metrics = app.extensions.get("metrics")
+    if metrics is not None:
+        metrics.sources[name] = fn
+
+
+def _component_sources(app):
+    # looked up at scrape time: the caches are created lazily on first use
+    def ext_stats(name):
+        obj = app.extensions.get(name)
+        return obj.stats() if obj is not None else None
+
+    def token_cache():
+        from app.utils.jwt_helpers import token_cache_stats
+        return token_cache_stats()
+
+    def request_log():
+        handler = app.extensions.get("request_log")
+        if handler is None:
+            return None
+        return {"dropped": handler.dropped, "queued": handler.queue.qsize()}
+
+    return {
+        "trip_point_writer": lambda: ext_stats("trip_point_writer"),
+        "password_hasher": lambda: ext_stats("password_hasher"),
+        "token_cache": token_cache,
+        "trip_state_cache": lambda: ext_stats("trip_state_cache"),
+        "tracker_cache": lambda: ext_stats("trip_trackers"),
+        "request_log": request_log,
+    }
+
+
+def init_metrics(app, db):
+    token = app.config.get("METRICS_TOKEN")
+    # no token, no endpoint: /metrics names every route and cache size, never serve it anonymously
+    if not app.config.get("METRICS_ENABLED", True) or not token:
+        return None
+    expected = f"Bearer {token}".encode()
+    metrics = Metrics()
+    metrics.sources.update(_component_sources(app))
+    app.extensions["metrics"] = metrics
+    with app.app_context():
+        metrics.engine = db.engine
+        _instrument_engine(metrics, db.engine)
+
+    @app.before_request
+    def _metrics_start():
+        g._metrics_t0 = time.perf_counter()
+
+    @app.after_request
+    def _metrics_record(response):
+        t0 = g.get("_metrics_t0")
+        if t0 is not None:
+            metrics.record_request(request.endpoint or "unmatched", request.method, response.status_code,
+                                   time.perf_counter() - t0,
+                                   g.get("_metrics_sql_n", 0), g.get("_metrics_sql_s", 0.0))
+        return response
+
+    @app.get("/metrics")
+    def metrics_view():
+        if not hmac.compare_digest(request.headers.get("Authorization", "").encode(), expected):
+            return Response("forbidden\n", status=403, mimetype="text/plain")
+        return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+    return metrics
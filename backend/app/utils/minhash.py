@@ -0,0 +1,71 @@
+# app/utils/minhash.py
+"""
+MinHash sketches and LSH banding over int64 route cells.
+
+With b bands of r rows, two routes with Jaccard s share at least one band
+bucket with probability 1 - (1 - s**r)**b, so (b, r) sets the recall/latency
+trade-off: more bands -> more candidates, higher recall.
+"""
+import hashlib
+
+import numpy as np
+
+_PRIME = np.uint64(4294967311)          # smallest prime > 2**32
+_MASK32 = np.uint64(0xFFFFFFFF)
+
+
+def _params(num_perm, seed):
+    rnd = np.random.RandomState(seed)
+    a = rnd.randint(1, 1 << 31, size=num_perm).astype(np.uint64)
+    b = rnd.randint(0, 1 << 32, size=num_perm, dtype=np.int64).astype(np.uint64)
+    return a, b
+
+
+_PARAMS = {}
+
+
+def _mix32(cells):
+    # splitmix64 finalizer, folded to 32 bits
+    x = np.asarray(cells, dtype=np.int64).astype(np.uint64)
+    with np.errstate(over="ignore"):
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        x = x ^ (x >> np.uint64(31))
+    return (x ^ (x >> np.uint64(32))) & _MASK32
+
+
+def sketch(cells, num_perm=64, seed=1) -> np.ndarray:
+    """uint32[num_perm] MinHash of a set of int64 cells."""
+    key = (num_perm, seed)
+    if key not in _PARAMS:
+        _PARAMS[key] = _params(num_perm, seed)
+    a, b = _PARAMS[key]
+    x = _mix32(cells)
+    if x.size == 0:
+        return np.full(num_perm, 0xFFFFFFFF, dtype=np.uint32)
+    h = ((a[:, None] * x[None, :] + b[:, None]) % _PRIME) & _MASK32
+    return h.min(axis=1).astype(np.uint32)
+
+
+def sketch_to_bytes(sk) -> bytes:
+    return np.asarray(sk, dtype="<u4").tobytes()
+
+
+def sketch_from_bytes(blob) -> np.ndarray:
+    return np.frombuffer(blob, dtype="<u4")
+
+
+def band_keys(sk, bands) -> list[int]:
+    """One signed 64-bit bucket key per band (fits a BIGINT column)."""
+    rows = len(sk) // bands
+    raw = np.asarray(sk, dtype="<u4")
+    keys = []
+    for i in range(bands):
+        digest = hashlib.blake2b(raw[i * rows:(i + 1) * rows].tobytes(),
+                                 digest_size=8, person=b"band%04d" % i).digest()
+        keys.append(int.from_bytes(digest, "little", signed=True))
+    return keys
+
+
+def estimate_jaccard(sk_a, sk_b) -> float:
+    return float(np.mean(np.asarray(sk_a) == np.asarray(sk_b)))
@@ -0,0 +1,67 @@
+# app/utils/nplus1.py
+"""
+N+1 detector for dev and tests (NPLUS1_DETECT = off | warn | raise).
+
+Counts the lazy relationship loads each request triggers, per relationship.
+Once one relationship lazy-loads NPLUS1_THRESHOLD times in a single request,
+"warn" logs it and "raise" fails the query with NPlusOneError, so a test
+hitting a list endpoint breaks as soon as queries grow with the row count.
+The fix is usually an entry in the service's default_load_options.
+Eager loads (selectinload/joinedload) are not counted. Responses carry
+X-Lazy-Loads with the request's total while the detector is on.
+"""
+import logging
+
+from flask import current_app, g, has_request_context
+from sqlalchemy import event
+
+log = logging.getLogger("app.nplus1")
+
+
+class NPlusOneError(AssertionError):
+    """One relationship was lazy-loaded NPLUS1_THRESHOLD times in a request."""
+
+
+def _relationship_name(state) -> str:
+    path = state.loader_strategy_path
+    try:
+        mapper, prop = path[-2], path[-1]
+        return f"{mapper.class_.__name__}.{prop.key}"
+    except (IndexError, AttributeError, TypeError):
+        return str(path)
+
+
+def _count_lazy_loads(state):
+    # lazy_loaded_from is only set for lazy loads, not selectin/subquery eager loads
+    if state.lazy_loaded_from is None or not has_request_context():
+        return
+    cfg = current_app.extensions.get("nplus1")
+    if cfg is None:
+        return
+    mode, threshold = cfg
+    counts = g.setdefault("_lazy_loads", {})
+    name = _relationship_name(state)
+    n = counts[name] = counts.get(name, 0) + 1
+    if n == threshold:
+        msg = f"{name} lazy-loaded {n} times in one request; add it to the service's default_load_options"
+        if mode == "raise":
+            raise NPlusOneError(msg)
+        log.warning(msg)
+
+
+def init_nplus1_detector(app, db):
+    mode = (app.config.get("NPLUS1_DETECT") or "off").lower()
+    if mode not in ("warn", "raise"):
+        return None
+    app.extensions["nplus1"] = (mode, app.config.get("NPLUS1_THRESHOLD", 5))
+    # db.session is shared by every app in the process; listen once
+    if not event.contains(db.session, "do_orm_execute", _count_lazy_loads):
+        event.listen(db.session, "do_orm_execute", _count_lazy_loads)
+
+    @app.after_request
+    def _lazy_load_header(response):
+        counts = g.get("_lazy_loads")
+        response.headers["X-Lazy-Loads"] = str(sum(counts.values()) if counts else 0)
+        return response
+
+    return mode
@@ -0,0 +1,205 @@
+# app/utils/polyline.py
+import base64
+from math import asin, cos, radians, sin, sqrt
+
+import numpy as np
+
+EARTH_R = 6371000.0
+
+
+# ---- scalar reference (what routes_cluster has always used) ----
+
+def haversine_m(a, b):
+    (lat1, lon1), (lat2, lon2) = a, b
+    p1, p2 = radians(lat1), radians(lat2)
+    dlat = p2 - p1
+    dlon = radians(lon2 - lon1)
+    x = sin(dlat/2)**2 + cos(p1)*cos(p2)*sin(dlon/2)**2
+    return 2 * EARTH_R * asin(sqrt(x))
+
+
+def decode_polyline(encoded):
+    coords = []; index = lat = lng = 0
+    while index < len(encoded):
+        for coord in (True, False):
+            result = shift = 0
+            while True:
+                b = ord(encoded[index]) - 63; index += 1
+                result |= (b & 0x1f) << shift
+                shift += 5
+                if b < 0x20: break
+            d = ~(result >> 1) if (result & 1) else (result >> 1)
+            if coord: lat += d
+            else:     lng += d
+        coords.append((lat/1e5, lng/1e5))
+    return coords
+
+
+def resample_every_m(points, step_m=100):
+    if not points: return []
+    out = [points[0]]; acc = 0.0; a = points[0]
+    for b in points[1:]:
+        seg = haversine_m(a, b)
+        while acc + seg >= step_m and seg > 0:
+            ratio = (step_m - acc) / seg
+            lat = a[0] + ratio * (b[0] - a[0])
+            lng = a[1] + ratio * (b[1] - a[1])
+            out.append((lat, lng))
+            a = (lat, lng)
+            seg = haversine_m(a, b)
+            acc = 0.0
+        acc += seg
+        a = b
+    return out
+
+
+# every encoded value ends on a char below '_' (chunk < 0x20)
+_CONTINUATION = bytes(range(95, 128))
+
+
+def count_points(encoded: str) -> int:
+    """Number of points in an encoded polyline, without decoding it."""
+    return len(encoded.encode("ascii").translate(None, _CONTINUATION)) // 2
+
+
+# ---- NumPy ----
+
+def decode_polyline_np(encoded: str):
+    """
+    Decode a Google encoded polyline into two float64 arrays (lat, lng).
+    Same output as decode_polyline, without the per-char loop.
+    """
+    if not encoded:
+        return np.empty(0), np.empty(0)
+    raw = np.frombuffer(encoded.encode("ascii"), dtype=np.uint8).astype(np.int64) - 63
+
+    # every value is a run of 5-bit chunks; a chunk < 0x20 terminates the run
+    ends = np.flatnonzero(raw < 0x20)
+    if ends.size == 0:
+        return np.empty(0), np.empty(0)
+    raw = raw[: ends[-1] + 1]
+    starts = np.empty_like(ends)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+
+    pos = np.arange(raw.size) - np.repeat(starts, ends - starts + 1)
+    values = np.add.reduceat((raw & 0x1f) << (5 * pos), starts)
+    deltas = np.where(values & 1, ~(values >> 1), values >> 1)
+
+    n = deltas.size // 2
+    lat = np.cumsum(deltas[0:2 * n:2]) / 1e5
+    lng = np.cumsum(deltas[1:2 * n:2]) / 1e5
+    return lat, lng
+
+
+def haversine_np(lat1, lng1, lat2, lng2):
+    """Element-wise haversine distance in metres."""
+    p1, p2 = np.radians(lat1), np.radians(lat2)
+    dlat = p2 - p1
+    dlon = np.radians(lng2 - lng1)
+    x = np.sin(dlat / 2) ** 2 + np.cos(p1) * np.cos(p2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_R * np.arcsin(np.sqrt(x))
+
+
+def segment_lengths(lat, lng):
+    """Length in metres of each consecutive segment (size n-1)."""
+    return haversine_np(lat[:-1], lng[:-1], lat[1:], lng[1:])
+
+
+def _encode_value(v: int, out: list):
+    v = ~(v << 1) if v < 0 else (v << 1)
+    while v >= 0x20:
+        out.append(chr((0x20 | (v & 0x1f)) + 63))
+        v >>= 5
+    out.append(chr(v + 63))
+
+
+class PolylineEncoder:
+    """encode_polyline fed in chunks: keeps the previous point between feed() calls."""
+
+    def __init__(self):
+        self.prev_lat = self.prev_lng = 0
+        self.count = 0
+
+    def feed(self, points) -> str:
+        out = []
+        prev_lat, prev_lng = self.prev_lat, self.prev_lng
+        for lat, lng in points:
+            ilat, ilng = int(round(lat * 1e5)), int(round(lng * 1e5))
+            _encode_value(ilat - prev_lat, out)
+            _encode_value(ilng - prev_lng, out)
+            prev_lat, prev_lng = ilat, ilng
+            self.count += 1
+        self.prev_lat, self.prev_lng = prev_lat, prev_lng
+        return "".join(out)
+
+
+def encode_polyline(points) -> str:
+    """Encode an iterable of (lat, lng) into a Google encoded polyline."""
+    return PolylineEncoder().feed(points)
+
+
+def pack_delta_e6(lat, lng) -> bytes:
+    """
+    Little-endian int32 microdegrees, interleaved [lat0, lng0, dlat1, dlng1, ...]
+    (first point absolute, then deltas). Lossless for DECIMAL(9,6) coordinates.
+    """
+    q = np.empty(2 * len(lat), dtype=np.int64)
+    q[0::2] = np.rint(np.asarray(lat, dtype=np.float64) * 1e6)
+    q[1::2] = np.rint(np.asarray(lng, dtype=np.float64) * 1e6)
+    q[2:] = q[2:] - q[:-2]
+    return q.astype("<i4").tobytes()
+
+
+def unpack_delta_e6(raw: bytes):
+    """Inverse of pack_delta_e6 -> (lat, lng) float64 arrays."""
+    q = np.frombuffer(raw, dtype="<i4").astype(np.int64)
+    return np.cumsum(q[0::2]) / 1e6, np.cumsum(q[1::2]) / 1e6
+
+
+def encode_delta_e6(lat, lng) -> str:
+    """pack_delta_e6 as base64, for JSON responses."""
+    return base64.b64encode(pack_delta_e6(lat, lng)).decode("ascii")
+
+
+def decode_delta_e6(data: str):
+    return unpack_delta_e6(base64.b64decode(data))
+
+
+def simplify_dp(lat, lng, tolerance_m: float) -> np.ndarray:
+    """
+    Douglas-Peucker: indices of the points to keep so that no dropped point is
+    more than tolerance_m from the simplified line. Endpoints are always kept.
+    """
+    n = len(lat)
+    if n <= 2 or tolerance_m <= 0:
+        return np.arange(n)
+    lat = np.asarray(lat, dtype=np.float64)
+    lng = np.asarray(lng, dtype=np.float64)
+    # local equirectangular metres; plenty for trip-sized extents
+    kx = EARTH_R * np.cos(np.radians(lat[0])) * np.pi / 180.0
+    ky = EARTH_R * np.pi / 180.0
+    x, y = (lng - lng[0]) * kx, (lat - lat[0]) * ky
+
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        i, j = stack.pop()
+        if j - i < 2:
+            continue
+        dx, dy = x[j] - x[i], y[j] - y[i]
+        px, py = x[i + 1:j] - x[i], y[i + 1:j] - y[i]
+        len2 = dx * dx + dy * dy
+        if len2 == 0:
+            d = np.hypot(px, py)
+        else:
+            t = np.clip((px * dx + py * dy) / len2, 0.0, 1.0)
+            d = np.hypot(px - t * dx, py - t * dy)
+        k = int(np.argmax(d))
+        if d[k] > tolerance_m:
+            m = i + 1 + k
+            keep[m] = True
+            stack.append((i, m))
+            stack.append((m, j))
+    return np.flatnonzero(keep)
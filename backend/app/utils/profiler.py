@@ -0,0 +1,206 @@
+# app/utils/profiler.py
+"""
+Opt-in profiling of single production requests.
+
+A request carrying a valid X-Profile header runs under cProfile while a
+sampler thread records its stack every PROFILE_SAMPLE_MS, and every SQL
+statement it executes is timed. Three files land in PROFILE_DIR:
+
+    <stamp>-<path>.pstats      python -m pstats / snakeviz
+    <stamp>-<path>.collapsed   flamegraph.pl / speedscope
+    <stamp>-<path>.sql.json    statement timeline (offset, duration, SQL; no params)
+
+The header is "<unix ts>.<hex hmac-sha256(PROFILE_SECRET, 'ts:METHOD:path')>",
+accepted for PROFILE_MAX_AGE_SEC; `flask profile sign GET /api/v1/...` prints one.
+The check lives in a WSGI wrapper: requests without the header cost one
+environ lookup, and no profiler or SQL listener is installed for them.
+"""
+import cProfile
+import hashlib
+import hmac
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from sqlalchemy import event
+
+HEADER_ENVIRON = "HTTP_X_PROFILE"
+
+
+def sign_profile_request(secret: str, method: str, path: str, ts: int | None = None) -> str:
+    ts = int(time.time()) if ts is None else int(ts)
+    mac = hmac.new(secret.encode(), f"{ts}:{method.upper()}:{path}".encode(), hashlib.sha256)
+    return f"{ts}.{mac.hexdigest()}"
+
+
+def verify_profile_header(secret: str, value: str, method: str, path: str, max_age: float) -> bool:
+    ts, _, _ = value.partition(".")
+    try:
+        age = time.time() - int(ts)
+    except ValueError:
+        return False
+    if not -30 <= age <= max_age:
+        return False
+    return hmac.compare_digest(value, sign_profile_request(secret, method, path, int(ts)))
+
+
+class _StackSampler(threading.Thread):
+    """Samples one thread's Python stack into collapsed-stack counts."""
+
+    def __init__(self, target_ident, interval):
+        super().__init__(daemon=True, name="request-profiler-sampler")
+        self.target = target_ident
+        self.interval = interval
+        self.stacks = Counter()
+        self._halt = threading.Event()
+
+    def run(self):
+        while not self._halt.wait(self.interval):
+            frame = sys._current_frames().get(self.target)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(names))] += 1
+
+    def stop(self):
+        self._halt.set()
+        self.join()
+
+
+class _SqlTimeline:
+    """Times the statements run on one thread while attached to the engine."""
+
+    def __init__(self, engine, thread_ident, t0):
+        self.engine = engine
+        self.thread = thread_ident
+        self.t0 = t0
+        self.rows = []
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == self.thread:
+            conn.info["_profile_t"] = time.perf_counter()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() != self.thread:
+            return
+        start = conn.info.pop("_profile_t", None)
+        if start is None:
+            return
+        now = time.perf_counter()
+        self.rows.append({
+            "at_ms": round((start - self.t0) * 1000, 3),
+            "ms": round((now - start) * 1000, 3),
+            "executemany": executemany,
+            "rowcount": getattr(cursor, "rowcount", None),
+            "statement": statement,
+        })
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._before)
+        event.listen(self.engine, "after_cursor_execute", self._after)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._before)
+        event.remove(self.engine, "after_cursor_execute", self._after)
+
+
+class RequestProfiler:
+    """WSGI wrapper; only requests with a valid X-Profile header are profiled."""
+
+    def __init__(self, wsgi_app, *, engine, secret, out_dir, max_age=300.0, sample_ms=1.0):
+        self.wsgi_app = wsgi_app
+        self.engine = engine
+        self.secret = secret
+        self.out_dir = out_dir
+        self.max_age = max_age
+        self.interval = sample_ms / 1000.0
+        # cProfile is process-wide on newer Pythons; one profiled request at a time
+        self._busy = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        value = environ.get(HEADER_ENVIRON)
+        if not value:
+            return self.wsgi_app(environ, start_response)
+        method, path = environ.get("REQUEST_METHOD", "GET"), environ.get("PATH_INFO", "/")
+        if not verify_profile_header(self.secret, value, method, path, self.max_age):
+            return self.wsgi_app(environ, start_response)
+        if not self._busy.acquire(blocking=False):
+            return self.wsgi_app(environ, start_response)
+        try:
+            return self._profiled(environ, start_response, method, path)
+        finally:
+            self._busy.release()
+
+    def _profiled(self, environ, start_response, method, path):
+        stamp = time.strftime("%Y%m%dT%H%M%S") + f"-{os.getpid()}-{threading.get_ident() % 10000:04d}"
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", f"{method}{path}").strip("_")[:80]
+        base = os.path.join(self.out_dir, f"{stamp}-{slug}")
+
+        def _start_response(status, headers, exc_info=None):
+            headers = list(headers) + [("X-Profile-Id", os.path.basename(base))]
+            return start_response(status, headers, exc_info)
+
+        t0 = time.perf_counter()
+        sampler = _StackSampler(threading.get_ident(), self.interval)
+        prof = cProfile.Profile()
+        with _SqlTimeline(self.engine, threading.get_ident(), t0) as sql:
+            sampler.start()
+            prof.enable()
+            try:
+                # drain the body inside the profile: streamed responses do their work here
+                app_iter = self.wsgi_app(environ, _start_response)
+                try:
+                    body = list(app_iter)
+                finally:
+                    if hasattr(app_iter, "close"):
+                        app_iter.close()
+            finally:
+                prof.disable()
+                sampler.stop()
+        elapsed_ms = (time.perf_counter() - t0) * 1000
+
+        os.makedirs(self.out_dir, exist_ok=True)
+        prof.dump_stats(base + ".pstats")
+        with open(base + ".collapsed", "w") as f:
+            for stack, n in sampler.stacks.most_common():
+                f.write(f"{stack} {n}\n")
+        with open(base + ".sql.json", "w") as f:
+            json.dump({
+                "method": method,
+                "path": path,
+                "query": environ.get("QUERY_STRING", ""),
+                "elapsed_ms": round(elapsed_ms, 3),
+                "sql_count": len(sql.rows),
+                "sql_ms": round(sum(r["ms"] for r in sql.rows), 3),
+                "statements": sql.rows,
+            }, f, indent=1, default=str)
+        return body
+
+
+def init_profiler(app, db):
+    secret = app.config.get("PROFILE_SECRET")
+    if not secret:
+        return None
+    with app.app_context():
+        engine = db.engine
+    profiler = RequestProfiler(
+        app.wsgi_app,
+        engine=engine,
+        secret=secret,
+        out_dir=app.config.get("PROFILE_DIR", "/tmp/safepath-profiles"),
+        max_age=app.config.get("PROFILE_MAX_AGE_SEC", 300.0),
+        sample_ms=app.config.get("PROFILE_SAMPLE_MS", 1.0),
+    )
+    app.wsgi_app = profiler
+    app.extensions["request_profiler"] = profiler
+    return profiler
+
@@ -0,0 +1,143 @@
+# app/utils/request_log.py
+"""
+Structured request logging that stays off the request path.
+
+after_request builds one small dict per sampled request and hands it to a
+QueueHandler; a QueueListener thread does the JSON encoding and the stdout
+write. Sampling is per endpoint (REQUEST_LOG_ROUTE_SAMPLES, e.g.
+"trip_bp.trip_ping=0.01"), 5xx responses are always logged, sensitive headers
+are redacted, and the raw body is only captured when REQUEST_LOG_BODY is on.
+Bodies of REQUEST_LOG_BODY_SKIP endpoints (auth, user create/update) are never
+captured, and REQUEST_LOG_BODY_REDACT fields are masked in the raw text of the
+others. Nothing parses the JSON body for logging.
+"""
+import atexit
+import json
+import logging
+import queue
+import random
+import re
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import g, request
+
+log = logging.getLogger("app.requests")
+
+DEFAULT_REDACT = "authorization,cookie,set-cookie,proxy-authorization,x-api-key"
+DEFAULT_BODY_SKIP = "auth.register,auth.login,user_bp.user"
+DEFAULT_BODY_REDACT = "password,token,phone_number"
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """Drops records instead of blocking (or raising) when the queue is full."""
+
+    def __init__(self, q):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # formatting happens in the listener thread
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        doc = record.msg if isinstance(record.msg, dict) else {"msg": record.getMessage()}
+        doc = {"ts": round(record.created, 3), "level": record.levelname, "logger": record.name, **doc}
+        return json.dumps(doc, default=str, separators=(",", ":"))
+
+
+def _parse_samples(spec: str) -> dict:
+    out = {}
+    for part in (spec or "").split(","):
+        name, _, rate = part.strip().partition("=")
+        if name and rate:
+            out[name.strip()] = float(rate)
+    return out
+
+
+def _split(spec: str) -> list:
+    return [p.strip() for p in (spec or "").split(",") if p.strip()]
+
+
+def _body_redactor(fields):
+    """Masks `"field": "..."` / `"field": 123` (JSON) and `field=...` (form) in raw body text."""
+    if not fields:
+        return lambda text: text
+    names = "|".join(re.escape(f) for f in fields)
+    json_re = re.compile(rf'("(?:{names})"\s*:\s*)("(?:[^"\\]|\\.)*"?|[^,}}\s]+)', re.IGNORECASE)
+    form_re = re.compile(rf'(^|&)((?:{names})=)[^&]*', re.IGNORECASE)
+
+    def redact(text):
+        text = json_re.sub(r'\1"[redacted]"', text)
+        return form_re.sub(r"\1\2[redacted]", text)
+    return redact
+
+
+def init_request_logging(app):
+    cfg = app.config
+    if not cfg.get("REQUEST_LOG_ENABLED", True):
+        return None
+
+    handler = _DroppingQueueHandler(queue.Queue(maxsize=cfg.get("REQUEST_LOG_QUEUE_MAX", 10000)))
+    out = logging.StreamHandler(sys.stdout)
+    out.setFormatter(JsonFormatter())
+    listener = QueueListener(handler.queue, out, respect_handler_level=False)
+    listener.start()
+    atexit.register(listener.stop)
+
+    log.setLevel(logging.INFO)
+    log.propagate = False
+    log.handlers[:] = [handler]
+
+    default_rate = cfg.get("REQUEST_LOG_SAMPLE", 1.0)
+    route_rates = _parse_samples(cfg.get("REQUEST_LOG_ROUTE_SAMPLES", ""))
+    with_headers = cfg.get("REQUEST_LOG_HEADERS", True)
+    with_body = cfg.get("REQUEST_LOG_BODY", False)
+    body_max = cfg.get("REQUEST_LOG_BODY_MAX", 2048)
+    redact = {h.strip().lower() for h in cfg.get("REQUEST_LOG_REDACT", DEFAULT_REDACT).split(",") if h.strip()}
+    body_skip = set(_split(cfg.get("REQUEST_LOG_BODY_SKIP", DEFAULT_BODY_SKIP)))
+    redact_body = _body_redactor(_split(cfg.get("REQUEST_LOG_BODY_REDACT", DEFAULT_BODY_REDACT)))
+
+    @app.before_request
+    def _request_log_start():
+        g._req_log_t0 = time.perf_counter()
+
+    @app.after_request
+    def _request_log(response):
+        rate = route_rates.get(request.endpoint, default_rate)
+        if response.status_code < 500 and (rate <= 0 or (rate < 1 and random.random() >= rate)):
+            return response
+        t0 = g.get("_req_log_t0")
+        doc = {
+            "method": request.method,
+            "path": request.path,
+            "endpoint": request.endpoint,
+            "status": response.status_code,
+            "duration_ms": round((time.perf_counter() - t0) * 1000, 2) if t0 else None,
+            "remote": request.remote_addr,
+            "sample": rate,
+        }
+        if request.query_string:
+            doc["query"] = request.query_string.decode("latin-1")
+        user = getattr(request, "user", None)
+        if user:
+            doc["user_id"] = user.get("user_id")
+        if with_headers:
+            doc["headers"] = {k: ("[redacted]" if k.lower() in redact else v) for k, v in request.headers.items()}
+        if with_body and request.content_length and request.endpoint not in body_skip:
+            # raw bytes Werkzeug already buffered; no JSON parse
+            doc["body"] = redact_body(request.get_data(cache=True)[:body_max].decode("utf-8", "replace"))
+        log.info(doc)
+        return response
+
+    app.extensions["request_log"] = handler
+    return handler
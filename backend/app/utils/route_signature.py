@@ -0,0 +1,173 @@
+# app/utils/route_signature.py
+"""
+Vectorized route signature engine.
+
+Mirrors decode_polyline -> resample_every_m -> geohash_encode, but works on
+whole NumPy arrays at once. Short routes (and the grid fallback, whose 1e-6 deg
+cells can see the ~1e-9 deg interpolation drift) take the scalar path instead.
+"""
+import hashlib
+import json
+
+import numpy as np
+
+from app.utils.polyline import (count_points, decode_polyline, decode_polyline_np,
+                                resample_every_m, segment_lengths)
+
+try:
+    import geohash as _gh
+    HAS_GEOHASH = True
+
+    def geohash_encode(lat, lng, precision):
+        return _gh.encode(lat, lng, precision=precision)
+except Exception:
+    HAS_GEOHASH = False
+
+    def geohash_encode(lat, lng, precision):
+        q = 10 ** (precision - 1)
+        return f"{round(float(lat)*q)}:{round(float(lng)*q)}"
+
+# below this many points the array setup costs more than the Python loops
+SCALAR_MAX_POINTS = 80
+
+_BASE32 = np.frombuffer(b"0123456789bcdefghjkmnpqrstuvwxyz", dtype="S1")
+_BASE32_INDEX = np.full(256, -1, dtype=np.int64)
+_BASE32_INDEX[np.frombuffer(_BASE32.tobytes(), dtype=np.uint8)] = np.arange(32)
+
+# fallback "lat:lng" cells are packed into one int64: lat in the high word, lng in the low
+_LAT_OFF = 1 << 30
+_LNG_OFF = 1 << 31
+
+
+def resample_np(lat, lng, step_m=100):
+    """Points every `step_m` metres along the path, starting at the first point."""
+    if lat.size == 0:
+        return lat, lng
+    seg = segment_lengths(lat, lng)
+    cum = np.concatenate(([0.0], np.cumsum(seg)))
+    k = int(cum[-1] // step_m)
+    if k == 0:
+        return lat[:1], lng[:1]
+
+    targets = step_m * np.arange(1, k + 1, dtype=np.float64)
+    # segment i such that cum[i] < t <= cum[i+1]
+    j = np.minimum(np.searchsorted(cum, targets, side="left"), lat.size - 1)
+    i = j - 1
+    ratio = (targets - cum[i]) / seg[i]
+    out_lat = np.concatenate((lat[:1], lat[i] + ratio * (lat[j] - lat[i])))
+    out_lng = np.concatenate((lng[:1], lng[i] + ratio * (lng[j] - lng[i])))
+    return out_lat, out_lng
+
+
+def _geohash_ints(lat, lng, precision):
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = (5 * precision) // 2
+    lng = (lng + 180.0) % 360.0 - 180.0
+    lat_i = np.clip(np.floor((lat / 90.0 + 1.0) * (1 << (lat_bits - 1))), 0, (1 << lat_bits) - 1).astype(np.int64)
+    lon_i = np.clip(np.floor((lng / 180.0 + 1.0) * (1 << (lon_bits - 1))), 0, (1 << lon_bits) - 1).astype(np.int64)
+
+    # interleave, longitude first (most significant bit)
+    code = np.zeros(lat.size, dtype=np.int64)
+    for b in range(5 * precision):
+        if b % 2 == 0:
+            bit = (lon_i >> (lon_bits - 1 - b // 2)) & 1
+        else:
+            bit = (lat_i >> (lat_bits - 1 - b // 2)) & 1
+        code = (code << 1) | bit
+    return code
+
+
+def _grid_ints(lat, lng, precision):
+    q = 10 ** (precision - 1)
+    lat_q = np.rint(lat * q).astype(np.int64)
+    lng_q = np.rint(lng * q).astype(np.int64)
+    return ((lat_q + _LAT_OFF) << 32) | (lng_q + _LNG_OFF)
+
+
+def encode_cells(lat, lng, precision=7):
+    """Integer cell id per point (geohash bits, or packed fallback grid)."""
+    lat = np.asarray(lat, dtype=np.float64)
+    lng = np.asarray(lng, dtype=np.float64)
+    if HAS_GEOHASH:
+        return _geohash_ints(lat, lng, precision)
+    return _grid_ints(lat, lng, precision)
+
+
+def cells_to_geohashes(cells, precision=7) -> list[str]:
+    """Render integer cells back into the strings geohash_encode produces."""
+    cells = np.asarray(cells, dtype=np.int64)
+    if cells.size == 0:
+        return []
+    if HAS_GEOHASH:
+        shifts = 5 * np.arange(precision - 1, -1, -1)
+        idx = (cells[:, None] >> shifts) & 0x1f
+        return _BASE32[idx].view(f"S{precision}").ravel().astype(str).tolist()
+    lat_q = (cells >> 32) - _LAT_OFF
+    lng_q = (cells & 0xFFFFFFFF) - _LNG_OFF
+    return [f"{a}:{b}" for a, b in zip(lat_q.tolist(), lng_q.tolist())]
+
+
+def _use_scalar(encoded: str) -> bool:
+    return not HAS_GEOHASH or count_points(encoded) <= SCALAR_MAX_POINTS
+
+
+def _scalar_signature(encoded: str, step_m, precision) -> list[str]:
+    pts = resample_every_m(decode_polyline(encoded), step_m)
+    return sorted({geohash_encode(lat, lng, precision) for (lat, lng) in pts})
+
+
+def signature_cells(encoded: str, step_m=100, precision=7):
+    """Sorted, unique int64 cells of the route."""
+    if _use_scalar(encoded):
+        return np.unique(geohashes_to_cells(_scalar_signature(encoded, step_m, precision)))
+    lat, lng = decode_polyline_np(encoded)
+    lat, lng = resample_np(lat, lng, step_m)
+    return np.unique(encode_cells(lat, lng, precision))
+
+
+def build_signature(encoded: str, step_m=100, precision=7) -> list[str]:
+    """Drop-in for routes_cluster.signature_from_polyline (same set, sorted)."""
+    if _use_scalar(encoded):
+        return _scalar_signature(encoded, step_m, precision)
+    return cells_to_geohashes(signature_cells(encoded, step_m, precision), precision)
+
+
+def geohashes_to_cells(geohashes) -> np.ndarray:
+    """Inverse of cells_to_geohashes: stored string signature -> int64 cells."""
+    if not geohashes:
+        return np.empty(0, dtype=np.int64)
+    if HAS_GEOHASH:
+        precision = len(geohashes[0])
+        raw = np.frombuffer("".join(geohashes).encode("ascii"), dtype=np.uint8).reshape(-1, precision)
+        digits = _BASE32_INDEX[raw]
+        shifts = 5 * np.arange(precision - 1, -1, -1)
+        return (digits << shifts).sum(axis=1)
+    pairs = np.array([g.split(":") for g in geohashes], dtype=np.int64)
+    return ((pairs[:, 0] + _LAT_OFF) << 32) | (pairs[:, 1] + _LNG_OFF)
+
+
+def cells_to_bytes(cells) -> bytes:
+    """Sorted little-endian int64 blob (RouteCluster.geohashes_bin)."""
+    return np.unique(np.asarray(cells, dtype=np.int64)).astype("<i8").tobytes()
+
+
+def cells_from_bytes(blob) -> np.ndarray:
+    return np.frombuffer(blob, dtype="<i8").astype(np.int64)
+
+
+def stored_cells(blob, geohashes_json=None) -> np.ndarray:
+    """Cells of a stored signature, whichever of the two columns is populated."""
+    if blob is not None:
+        return cells_from_bytes(blob)
+    return np.unique(geohashes_to_cells(json.loads(geohashes_json or "[]")))
+
+
+def jaccard_cells(a, b) -> float:
+    """Jaccard of two sorted unique int64 arrays."""
+    inter = np.intersect1d(a, b, assume_unique=True).size
+    return inter / max(1, a.size + b.size - inter)
+
+
+def signature_digest(blob: bytes) -> str:
+    """Stable id of a stored signature; (origin_hash, dest_hash, digest) is unique."""
+    return hashlib.blake2b(blob, digest_size=16).hexdigest()
@@ -0,0 +1,57 @@
+# benchmarks/bench_auth.py
+"""
+Auth overhead per request: token_required with and without the verified-token cache.
+
+    cd backend && python -m benchmarks.bench_auth
+"""
+import time
+from types import SimpleNamespace
+
+from flask import Flask
+
+from app.utils import jwt_helpers
+from app.utils.jwt_helpers import generate_token, token_required
+
+N = 20_000
+
+
+@token_required
+def endpoint():
+    return "ok"
+
+
+def run(app, headers, n):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        with app.test_request_context("/", headers=headers):
+            endpoint()
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+def main():
+    app = Flask(__name__)
+    token = generate_token(SimpleNamespace(id=1, email="a@x", name="a"))
+    headers = {"Authorization": f"Bearer {token}"}
+
+    # request context alone, to subtract from both runs
+    t0 = time.perf_counter()
+    for _ in range(N):
+        with app.test_request_context("/", headers=headers):
+            pass
+    base_us = (time.perf_counter() - t0) / N * 1e6
+
+    cache = jwt_helpers._token_cache
+    size = cache.maxsize
+    cache.maxsize = 0
+    off_us = run(app, headers, N)
+    cache.maxsize = size
+    cache.clear()
+    on_us = run(app, headers, N)
+
+    print(f"request context      {base_us:7.2f} us")
+    print(f"jwt.decode each time {off_us - base_us:7.2f} us/request")
+    print(f"verified-token cache {on_us - base_us:7.2f} us/request   {jwt_helpers.token_cache_stats()}")
+
+
+if __name__ == "__main__":
+    main()
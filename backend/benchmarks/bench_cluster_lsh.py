@@ -0,0 +1,132 @@
+# benchmarks/bench_cluster_lsh.py
+"""
+Recall/latency of the LSH match mode (RouteClusterService._best_match_lsh:
+route_cluster_band lookup + exact re-score) against the exact mode (in-process
+cluster_index), for one crowded OD pair seeded into a database.
+
+    cd backend && python -m benchmarks.bench_cluster_lsh --clusters 2000 --perm 64 --bands 16
+
+Runs on a throwaway SQLite file unless DATABASE_URL is set; the seeded OD pair
+is deleted afterwards either way.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+from sqlalchemy import select
+
+OD = ("bench", "lsh")
+
+
+def corridor(rnd, n=80):
+    # a random walk from a shared origin, like many routes out of one OD cell
+    lat, lng = 18.0, -76.8
+    heading = rnd.uniform(0, 2 * np.pi)
+    pts = []
+    for _ in range(n):
+        heading += rnd.uniform(-0.4, 0.4)
+        lat += 0.0006 * np.cos(heading)
+        lng += 0.0006 * np.sin(heading)
+        pts.append((lat, lng))
+    return pts
+
+
+def jitter(rnd, pts, m=0.0003):
+    return [(a + rnd.uniform(-m, m), b + rnd.uniform(-m, m)) for a, b in pts]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clusters", type=int, default=2000)
+    ap.add_argument("--queries", type=int, default=300)
+    ap.add_argument("--perm", type=int, default=64)
+    ap.add_argument("--bands", type=int, default=16)
+    args = ap.parse_args()
+
+    # app.config reads these on first import
+    if "DATABASE_URL" not in os.environ:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'lsh.db')}"
+    os.environ["ROUTE_MATCH_MODE"] = "lsh"
+    os.environ["MINHASH_NUM_PERM"] = str(args.perm)
+    os.environ["LSH_BANDS"] = str(args.bands)
+    os.environ.setdefault("REQUEST_LOG_ENABLED", "false")
+
+    from app import create_app, db
+    from app.models import RouteCluster, RouteClusterBand, RouteOdLock
+    from app.routes.routes_cluster import S_MATCH, SAMPLE_M, PREC_SIG
+    from app.services.route_cluster_index import cluster_index
+    from app.services.route_cluster_service import RouteClusterService
+    from app.utils.polyline import encode_polyline
+    from app.utils.route_signature import jaccard_cells, signature_cells
+
+    def cells(pts):
+        return signature_cells(encode_polyline(pts), SAMPLE_M, PREC_SIG)
+
+    def drop_pair():
+        # bulk deletes skip the ORM cascade, and SQLite doesn't enforce ON DELETE
+        ids = select(RouteCluster.id).where(RouteCluster.origin_hash == OD[0], RouteCluster.dest_hash == OD[1])
+        RouteClusterBand.query.filter(RouteClusterBand.cluster_id.in_(ids)).delete(synchronize_session=False)
+        RouteCluster.query.filter_by(origin_hash=OD[0], dest_hash=OD[1]).delete(synchronize_session=False)
+        RouteOdLock.query.filter_by(origin_hash=OD[0], dest_hash=OD[1]).delete(synchronize_session=False)
+        db.session.commit()
+
+    rnd = random.Random(7)
+    bases = [corridor(rnd) for _ in range(args.clusters)]
+    queries = [cells(jitter(rnd, bases[rnd.randrange(args.clusters)])) for _ in range(args.queries)]
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        drop_pair()
+
+        # seeded through the service, so minhash + band rows are what lsh mode writes
+        t0 = time.perf_counter()
+        stored = {}
+        for b in bases:
+            sig = cells(jitter(rnd, b))
+            row, _ = RouteClusterService._upsert(*OD, sig, 1, 10)
+            stored[row.id] = sig
+        db.session.commit()
+        t_seed = time.perf_counter() - t0
+
+        t_exact = t_lsh = 0.0
+        expected = found = agree = 0
+        for sig in queries:
+            # ground truth: Jaccard against every seeded cluster
+            truth_id, truth_sim = max(((cid, jaccard_cells(sig, other)) for cid, other in stored.items()),
+                                      key=lambda x: (x[1], -x[0]))
+            app.config["ROUTE_MATCH_MODE"] = "exact"
+            t0 = time.perf_counter()
+            exact, _ = RouteClusterService.best_match(*OD, sig)
+            t1 = time.perf_counter()
+            app.config["ROUTE_MATCH_MODE"] = "lsh"
+            lsh, _ = RouteClusterService.best_match(*OD, sig)
+            t2 = time.perf_counter()
+
+            t_exact += t1 - t0
+            t_lsh += t2 - t1
+            agree += exact is not None and exact.id == truth_id
+            if truth_sim >= S_MATCH:
+                expected += 1
+                found += lsh is not None and lsh.id == truth_id
+
+        backend = db.engine.dialect.name
+        drop_pair()
+        cluster_index.clear()
+
+    rows = args.perm // args.bands
+    print(f"{backend}: clusters={args.clusters} perm={args.perm} bands={args.bands} rows={rows} "
+          f"threshold~{(1 / args.bands) ** (1 / rows):.2f}  (seeded in {t_seed:.1f}s)")
+    print(f"exact mode agrees with brute force  {agree}/{len(queries)}")
+    print(f"lsh recall@S_MATCH  {found}/{expected} = {found / max(1, expected):.3f}")
+    print(f"exact (cluster_index)  {t_exact / len(queries) * 1000:.3f} ms/query")
+    print(f"lsh (band rows + rescore)  {t_lsh / len(queries) * 1000:.3f} ms/query")
+    if agree != len(queries):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# benchmarks/bench_serializers.py
+"""
+Parity check + micro-benchmark: the old inspect()-based BaseModel.to_dict vs
+the per-model serializers, and stdlib json vs orjson, on 10k Trip rows.
+
+    cd backend && python -m benchmarks.bench_serializers
+"""
+import json
+import random
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import inspect
+
+from app.models import Trip, TripPoint
+from app.utils.json_provider import HAS_ORJSON
+from app.utils.serializers import serializer_for
+
+N = 10_000
+
+
+def legacy_to_dict(obj):
+    """BaseModel.to_dict before the serializer registry."""
+    out = {}
+    for c in inspect(obj).mapper.column_attrs:
+        val = getattr(obj, c.key)
+        if isinstance(val, (bytes, bytearray, memoryview)):
+            val = val.hex()
+        elif isinstance(val, Decimal):
+            val = float(val)
+        elif isinstance(val, (datetime, date)):
+            val = val.isoformat()
+        out[c.key] = val
+    return out
+
+
+def make_trips(n):
+    rnd = random.Random(1)
+    t0 = datetime(2025, 1, 1)
+    return [Trip(id=i, user_id=rnd.randint(1, 500),
+                 origin_lat=Decimal("18.012345"), origin_lng=Decimal("-76.801234"),
+                 dest_lat=Decimal("18.054321"), dest_lng=Decimal("-76.754321"),
+                 mode="DRIVING", route_polyline="_p~iF~ps|U_ulLnnqC_mqNvxq`@" * 20,
+                 eta_sec=rnd.randint(60, 3600), distance_m=rnd.randint(500, 30000),
+                 status="COMPLETED", started_at=t0 + timedelta(minutes=i),
+                 ended_at=None if i % 3 else t0, cluster_id=None,
+                 cluster_sim=Decimal("0.812"), risk_level="NORMAL", alert_sent=False)
+            for i in range(n)]
+
+
+def make_points(n):
+    t0 = datetime(2025, 1, 1)
+    return [TripPoint(id=i, trip_id=1, lat=Decimal("18.000001") + i, lng=Decimal("-76.8"),
+                      recorded_at=t0 + timedelta(seconds=i)) for i in range(n)]
+
+
+def bench(label, fn, rows, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn(rows)
+        best = min(best, time.perf_counter() - t0)
+    print(f"  {label:<28} {best * 1000:9.2f} ms")
+    return out, best
+
+
+def main():
+    for name, rows in (("Trip", make_trips(N)), ("TripPoint", make_points(N))):
+        ser = serializer_for(type(rows[0]))
+        print(f"{name} x {N}")
+        old, t_old = bench("inspect to_dict", lambda rs: [legacy_to_dict(r) for r in rs], rows)
+        new, t_new = bench("serializer_for", lambda rs: [ser(r) for r in rs], rows)
+        if old != new:
+            raise SystemExit(f"{name}: serializer output differs from the legacy to_dict")
+        print(f"  -> x{t_old / max(t_new, 1e-9):.1f}, output identical")
+
+        bench("json.dumps(sort_keys)", lambda d: json.dumps(d, sort_keys=True), new)
+        if HAS_ORJSON:
+            import orjson
+            bench("orjson.dumps(SORT_KEYS)", lambda d: orjson.dumps(d, option=orjson.OPT_SORT_KEYS), new)
+            if json.loads(orjson.dumps(new)) != json.loads(json.dumps(new)):
+                raise SystemExit(f"{name}: orjson output differs")
+        else:
+            print("  orjson not installed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# benchmarks/bench_signature.py
+"""
+Parity check + micro-benchmark: pure-Python route signature vs build_signature.
+
+    cd backend && python -m benchmarks.bench_signature
+"""
+import random
+import time
+
+from app.routes.routes_cluster import signature_from_polyline, SAMPLE_M, PREC_SIG
+from app.utils.polyline import encode_polyline
+from app.utils.route_signature import build_signature, HAS_GEOHASH
+
+
+def random_route(n_points, seed):
+    rnd = random.Random(seed)
+    lat, lng = 18.0 + rnd.random() * 0.1, -76.8 + rnd.random() * 0.1
+    pts = [(lat, lng)]
+    for _ in range(n_points - 1):
+        lat += rnd.uniform(-0.0008, 0.0008)
+        lng += rnd.uniform(-0.0008, 0.0008)
+        pts.append((lat, lng))
+    return encode_polyline(pts)
+
+
+def timeit(fn, arg, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn(arg)
+    return (time.perf_counter() - t0) / repeat * 1000.0
+
+
+def main():
+    # Short routes and the grid fallback go through the scalar helpers; long
+    # routes with python-geohash through NumPy. Either way the set must match.
+    identical = 0
+    for seed in range(200):
+        poly = random_route(random.Random(seed).randint(2, 400), seed)
+        a, b = signature_from_polyline(poly), build_signature(poly, SAMPLE_M, PREC_SIG)
+        identical += set(a) == set(b)
+    print(f"parity ({'geohash' if HAS_GEOHASH else 'grid fallback'}): {identical}/200 identical")
+
+    for n in (50, 500, 5000):
+        poly = random_route(n, n)
+        py_ms = timeit(signature_from_polyline, poly, 20)
+        np_ms = timeit(lambda p: build_signature(p, SAMPLE_M, PREC_SIG), poly, 20)
+        print(f"{n:>5} pts  python {py_ms:8.3f} ms   engine {np_ms:8.3f} ms   x{py_ms / max(np_ms, 1e-9):.1f}")
+
+    if identical != 200:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# benchmarks/check_cursor_paging.py
+"""
+Keyset paging on a throwaway SQLite database where every trip shares one
+server_default started_at (the default order). Walks ?cursor= to the end for
+each ordering and fails on a repeated id, a missing id, or a next_cursor that
+never goes null.
+
+    cd backend && python -m benchmarks.check_cursor_paging
+"""
+import os
+import tempfile
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "cursor.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+os.environ.setdefault("REQUEST_LOG_ENABLED", "false")
+
+from sqlalchemy import insert, text  # noqa: E402
+
+from app import create_app, db  # noqa: E402
+from app.models import Trip, User  # noqa: E402
+from app.utils.jwt_helpers import generate_token  # noqa: E402
+
+TRIPS = 23
+PAGE = 5
+
+
+def seed():
+    owner = User(name="owner", email="owner@x", password="x")
+    db.session.add(owner)
+    db.session.flush()
+    db.session.execute(insert(Trip), [
+        {"user_id": owner.id, "origin_lat": 18.0, "origin_lng": -76.8, "dest_lat": 18.1, "dest_lng": -76.7,
+         "mode": "DRIVING", "route_polyline": "_p~iF~ps|U", "eta_sec": 600, "distance_m": 3500}
+        for _ in range(TRIPS)
+    ])
+    # one identical now() text value for all rows, as a burst of creates in one second stores it
+    db.session.execute(text("UPDATE trip SET started_at = (SELECT MIN(started_at) FROM trip)"))
+    db.session.commit()
+    return owner
+
+
+def walk(client, headers, query):
+    seen, cursor, pages = [], "", 0
+    while cursor is not None and pages <= TRIPS:
+        r = client.get(f"/api/v1/trip/?limit={PAGE}&cursor={cursor}{query}", headers=headers)
+        assert r.status_code == 200, (query, r.status_code, r.get_data(as_text=True)[:200])
+        body = r.get_json()
+        seen += [row["id"] for row in body["data"]]
+        cursor = body["meta"]["next_cursor"]
+        pages += 1
+    return seen, cursor
+
+
+def main():
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        headers = {"Authorization": f"Bearer {generate_token(seed())}"}
+    client = app.test_client()
+
+    failed = False
+    for query in ("", "&order_dir=asc", "&order_by=id", "&order_by=id&order_dir=asc"):
+        seen, cursor = walk(client, headers, query)
+        ok = cursor is None and len(seen) == len(set(seen)) == TRIPS
+        failed |= not ok
+        print(f"  cursor{query or ' (started_at desc)':<28} {len(seen):>3} rows  {len(set(seen)):>3} distinct  "
+              f"{'ok' if ok else 'FAIL'}")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
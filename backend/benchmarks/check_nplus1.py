@@ -0,0 +1,92 @@
+# benchmarks/check_nplus1.py
+"""
+Query counts of the list/get endpoints on a throwaway SQLite database, with
+the N+1 detector in raise mode. Fails if a listing's query count grows with
+the page size, or if the detector misses a lazy load it should catch
+(UserService without its default_load_options).
+
+    cd backend && python -m benchmarks.check_nplus1
+"""
+import os
+import tempfile
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "nplus1.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ.setdefault("NPLUS1_DETECT", "raise")
+os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+os.environ.setdefault("REQUEST_LOG_ENABLED", "false")
+
+from datetime import date  # noqa: E402
+
+from sqlalchemy import event  # noqa: E402
+
+from app import create_app, db  # noqa: E402
+from app.models import Trip, User, UserContact, UserInformation  # noqa: E402
+from app.services.user_service import UserService  # noqa: E402
+from app.utils.jwt_helpers import generate_token  # noqa: E402
+from app.utils.nplus1 import NPlusOneError  # noqa: E402
+
+USERS = 60
+
+
+def seed():
+    users = [User(name=f"u{i}", email=f"u{i}@x", password="x") for i in range(USERS)]
+    db.session.add_all(users)
+    db.session.flush()
+    for u in users:
+        db.session.add(UserInformation(user_id=u.id, gender="F", height="170", date_of_birth=date(1990, 1, 1),
+                                       phone_number=f"876{u.id:07d}"))
+    owner = users[0]
+    for u in users[1:]:
+        db.session.add(UserContact(user_id=owner.id, contact_user_id=u.id, label="friend"))
+        db.session.add(Trip(user_id=owner.id, origin_lat=18.0, origin_lng=-76.8, dest_lat=18.1, dest_lng=-76.7,
+                            mode="DRIVING", route_polyline="_p~iF~ps|U", eta_sec=600, distance_m=3500))
+    db.session.commit()
+    return owner
+
+
+def main():
+    app = create_app()
+    app.testing = True  # let NPlusOneError propagate instead of becoming a 500
+    statements = []
+    with app.app_context():
+        db.create_all()
+        owner = seed()
+        headers = {"Authorization": f"Bearer {generate_token(owner)}"}
+        event.listen(db.engine, "before_cursor_execute", lambda *a: statements.append(1))
+
+    client = app.test_client()
+
+    def queries(url):
+        statements.clear()
+        r = client.get(url, headers=headers)
+        assert r.status_code == 200, (url, r.status_code, r.get_data(as_text=True)[:200])
+        return len(statements)
+
+    failed = False
+    for url in ("/api/v1/user/?limit={n}",
+                "/api/v1/user-contact-route/?limit={n}",
+                "/api/v1/trip/?limit={n}"):
+        small, large = queries(url.format(n=5)), queries(url.format(n=50))
+        ok = small == large
+        failed |= not ok
+        print(f"  {url:<42} 5 rows: {small:>3} queries   50 rows: {large:>3}   {'ok' if ok else 'GROWS'}")
+    print(f"  /api/v1/user/<id>{'':<25} {queries(f'/api/v1/user/{owner.id}'):>3} queries")
+
+    # the detector has to notice the lazy loads once the eager load is gone
+    saved, UserService.default_load_options = UserService.default_load_options, ()
+    try:
+        queries("/api/v1/user/?limit=50")
+        print("  detector did not fire without default_load_options")
+        failed = True
+    except NPlusOneError as exc:
+        print(f"  without default_load_options: {exc}")
+    finally:
+        UserService.default_load_options = saved
+
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
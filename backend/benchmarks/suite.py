@@ -0,0 +1,425 @@
+# benchmarks/suite.py
+"""
+Benchmark suite for the route-clustering and ping hot paths.
+
+Builds a synthetic city (jittered street grid with missing blocks, curved
+edges), routes commuters across it with Dijkstra, and times:
+
+    micro.*   decode_polyline, resample_every_m, signature_from_polyline, jaccard
+              (the reference helpers in routes_cluster) and the NumPy engine that
+              /clusterize actually runs (signature_cells, jaccard_cells)
+    http.*    POST /routes/clusterize and POST /trip/<id>/ping through the Flask
+              test client on a file-backed SQLite database, and GET /trip/<id>
+              with /metrics off and on (the instrumentation overhead)
+
+Everything is seeded, so two runs on one machine see the same inputs.
+
+    cd backend && python -m benchmarks.suite                      # table + benchmarks/results.json
+    python -m benchmarks.suite --compare benchmarks/baseline.json # exit 1 on a regression
+    python -m benchmarks.suite --save-baseline                    # overwrite the stored baseline
+    python -m benchmarks.suite --quick                            # smaller corpus, fewer rounds
+
+Each result has a `score`: the best round for micro-benchmarks, the median
+latency for HTTP. A result regresses when its score is more than --tolerance
+(default 25%) above the baseline's. Baselines only mean
+something on the machine that produced them: `env` is stored alongside and a
+mismatch is reported. Record them with backend/requirements.txt installed
+(its numpy and python-geohash pins are what `env` should show).
+"""
+import argparse
+import heapq
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from importlib import metadata
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(HERE, "baseline.json")
+DEFAULT_OUT = os.path.join(HERE, "results.json")
+
+M_PER_DEG_LAT = 111_320.0
+
+
+# ---- synthetic city ----
+
+class CityNetwork:
+    """
+    A size x size street grid around `center`, block_m apart. Nodes are jittered,
+    a share of the streets is removed (parks, rivers, dead ends) and every street
+    gets a couple of bend points, so routes look like real encoded polylines.
+    """
+
+    def __init__(self, seed=1, size=30, block_m=150.0, jitter_m=20.0, drop=0.12, center=(18.01, -76.79)):
+        rnd = random.Random(seed)
+        self.rnd = rnd
+        self.size = size
+        lat0, lng0 = center
+        m_per_deg_lng = M_PER_DEG_LAT * math.cos(math.radians(lat0))
+        half = size * block_m / 2
+
+        self.nodes = {}
+        for i in range(size):
+            for j in range(size):
+                y = i * block_m - half + rnd.uniform(-jitter_m, jitter_m)
+                x = j * block_m - half + rnd.uniform(-jitter_m, jitter_m)
+                self.nodes[(i, j)] = (lat0 + y / M_PER_DEG_LAT, lng0 + x / m_per_deg_lng)
+
+        self.edges = {n: [] for n in self.nodes}
+        self.shape = {}
+        for (i, j) in self.nodes:
+            for nb in ((i + 1, j), (i, j + 1)):
+                if nb not in self.nodes or rnd.random() < drop:
+                    continue
+                a, b = self.nodes[(i, j)], self.nodes[nb]
+                bends = self._bends(a, b, rnd.randint(1, 3), jitter_m / 3, m_per_deg_lng)
+                length = sum(_dist_m(p, q) for p, q in zip([a, *bends], [*bends, b]))
+                self.edges[(i, j)].append((nb, length))
+                self.edges[nb].append(((i, j), length))
+                self.shape[((i, j), nb)] = bends
+                self.shape[(nb, (i, j))] = bends[::-1]
+
+    def _bends(self, a, b, n, wobble_m, m_per_deg_lng):
+        out = []
+        for k in range(1, n + 1):
+            t = k / (n + 1)
+            out.append((a[0] + t * (b[0] - a[0]) + self.rnd.uniform(-wobble_m, wobble_m) / M_PER_DEG_LAT,
+                        a[1] + t * (b[1] - a[1]) + self.rnd.uniform(-wobble_m, wobble_m) / m_per_deg_lng))
+        return out
+
+    def random_node(self, rnd):
+        return (rnd.randrange(self.size), rnd.randrange(self.size))
+
+    def route(self, src, dst, noise=0.0, rnd=None):
+        """Shortest path src -> dst as (lat, lng) points; noise > 0 perturbs edge weights (alternate routes)."""
+        dist, prev, heap = {src: 0.0}, {}, [(0.0, src)]
+        while heap:
+            d, node = heapq.heappop(heap)
+            if node == dst:
+                break
+            if d > dist.get(node, math.inf):
+                continue
+            for nb, length in self.edges[node]:
+                w = length * (1 + rnd.uniform(0, noise)) if noise else length
+                nd = d + w
+                if nd < dist.get(nb, math.inf):
+                    dist[nb], prev[nb] = nd, node
+                    heapq.heappush(heap, (nd, nb))
+        if dst not in prev and src != dst:
+            return None
+        path = [dst]
+        while path[-1] != src:
+            path.append(prev[path[-1]])
+        path.reverse()
+        pts = [self.nodes[path[0]]]
+        for a, b in zip(path, path[1:]):
+            pts.extend(self.shape[(a, b)])
+            pts.append(self.nodes[b])
+        return pts
+
+
+def _dist_m(a, b):
+    dlat = (b[0] - a[0]) * M_PER_DEG_LAT
+    dlng = (b[1] - a[1]) * M_PER_DEG_LAT * math.cos(math.radians(a[0]))
+    return math.hypot(dlat, dlng)
+
+
+def commuter_routes(city, n_routes, n_corridors, seed=2):
+    """n_routes trips over n_corridors origin/destination pairs, each taken with some route variation."""
+    rnd = random.Random(seed)
+    corridors = []
+    while len(corridors) < n_corridors:
+        a, b = city.random_node(rnd), city.random_node(rnd)
+        if abs(a[0] - b[0]) + abs(a[1] - b[1]) >= city.size // 2:
+            corridors.append((a, b))
+    routes = []
+    while len(routes) < n_routes:
+        a, b = rnd.choice(corridors)
+        pts = city.route(a, b, noise=rnd.choice((0.0, 0.0, 0.15, 0.4)), rnd=rnd)
+        if pts:
+            routes.append(pts)
+    return routes
+
+
+# ---- timing ----
+
+def _per_op(fn, items, rounds):
+    """Median/min microseconds per item over `rounds` passes (after one untimed warm-up pass)."""
+    for it in items:
+        fn(it)
+    times = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        for it in items:
+            fn(it)
+        times.append((time.perf_counter() - t0) / len(items) * 1e6)
+    # best round is the comparison score: scheduler noise only ever adds time
+    return {"unit": "us/op", "score": min(times), "median": statistics.median(times), "min": min(times),
+            "rounds": rounds, "ops": len(items)}
+
+
+def _latencies(samples_s):
+    ms = sorted(s * 1000 for s in samples_s)
+    med = statistics.median(ms)
+    return {"unit": "ms/req", "score": med, "median": med, "p95": ms[int(0.95 * (len(ms) - 1))],
+            "rps": len(ms) / (sum(ms) / 1000), "requests": len(ms)}
+
+
+def run_micro(routes, rounds):
+    from app.routes.routes_cluster import (SAMPLE_M, PREC_SIG, decode_polyline, jaccard,
+                                           resample_every_m, signature_from_polyline)
+    from app.utils.polyline import encode_polyline
+    from app.utils.route_signature import jaccard_cells, signature_cells
+
+    polys = [encode_polyline(r) for r in routes]
+    decoded = [decode_polyline(p) for p in polys]
+    sigs = [signature_from_polyline(p) for p in polys]
+    cells = [signature_cells(p, SAMPLE_M, PREC_SIG) for p in polys]
+    pairs = list(zip(sigs, sigs[1:] + sigs[:1]))
+    cell_pairs = list(zip(cells, cells[1:] + cells[:1]))
+
+    return {
+        "micro.decode_polyline": _per_op(decode_polyline, polys, rounds),
+        "micro.resample_every_m": _per_op(lambda pts: resample_every_m(pts, SAMPLE_M), decoded, rounds),
+        "micro.signature_from_polyline": _per_op(signature_from_polyline, polys, rounds),
+        "micro.jaccard": _per_op(lambda ab: jaccard(*ab), pairs, rounds),
+        "micro.signature_cells": _per_op(lambda p: signature_cells(p, SAMPLE_M, PREC_SIG), polys, rounds),
+        "micro.jaccard_cells": _per_op(lambda ab: jaccard_cells(*ab), cell_pairs, rounds),
+    }, {
+        "avg_points": statistics.mean(len(d) for d in decoded),
+        "avg_polyline_chars": statistics.mean(len(p) for p in polys),
+        "avg_signature_cells": statistics.mean(len(s) for s in sigs),
+    }
+
+
+def configure_env():
+    # app.config reads the environment on first import, so this runs before any app import
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    os.environ.setdefault("REQUEST_LOG_ENABLED", "false")
+    os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+
+
+def run_http(routes, pings):
+    from app import create_app, db
+    from app.models import Trip, User
+    from app.utils.jwt_helpers import generate_token
+    from app.utils.polyline import encode_polyline
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        user = User(name="bench", email="bench@example.com", password="x")
+        db.session.add(user)
+        db.session.flush()
+        route = max(routes, key=len)
+        trip = Trip(user_id=user.id, origin_lat=route[0][0], origin_lng=route[0][1],
+                    dest_lat=route[-1][0], dest_lng=route[-1][1], mode="DRIVING",
+                    route_polyline=encode_polyline(route), eta_sec=900, distance_m=5000)
+        db.session.add(trip)
+        db.session.commit()
+        headers = {"Authorization": f"Bearer {generate_token(user)}"}
+        trip_id = trip.id
+
+    client = app.test_client()
+    bodies = [{"origin": {"lat": r[0][0], "lng": r[0][1]},
+               "destination": {"lat": r[-1][0], "lng": r[-1][1]},
+               "encoded_polyline": encode_polyline(r)} for r in routes]
+
+    samples, statuses = [], {}
+    for body in bodies:
+        t0 = time.perf_counter()
+        res = client.post("/api/v1/routes/clusterize", json=body)
+        samples.append(time.perf_counter() - t0)
+        statuses[res.status_code] = statuses.get(res.status_code, 0) + 1
+    if set(statuses) - {200, 201}:
+        raise SystemExit(f"/clusterize answered {statuses}")
+    clusterize = {**_latencies(samples), "created": statuses.get(201, 0), "matched": statuses.get(200, 0)}
+
+    # walk the planned route back and forth, a little off the centreline
+    rnd = random.Random(3)
+    walk = route + route[::-1]
+    url = f"/api/v1/trip/{trip_id}/ping"
+    for lat, lng in walk[:20]:   # warm the trip state / tracker caches
+        client.post(url, json={"lat": lat, "lng": lng}, headers=headers)
+    samples = []
+    for k in range(pings):
+        lat, lng = walk[k % len(walk)]
+        body = {"lat": lat + rnd.uniform(-5e-5, 5e-5), "lng": lng + rnd.uniform(-5e-5, 5e-5)}
+        t0 = time.perf_counter()
+        res = client.post(url, json=body, headers=headers)
+        samples.append(time.perf_counter() - t0)
+        if res.status_code != 200:
+            raise SystemExit(f"/ping answered {res.status_code}: {res.get_data(as_text=True)[:200]}")
+
+    return {"http.clusterize": clusterize, "http.ping": _latencies(samples)}
+
+
+def run_metrics_overhead(requests):
+    """GET /trip/<id> on two apps over one database, /metrics off and on, interleaved."""
+    from app import create_app, db
+    from app.config import Config
+    from app.models import Trip, User
+    from app.utils.jwt_helpers import generate_token
+
+    apps = {}
+    for name, token in (("off", ""), ("on", "bench")):
+        Config.METRICS_TOKEN = token
+        try:
+            apps[name] = create_app()
+        finally:
+            Config.METRICS_TOKEN = ""
+    with apps["off"].app_context():
+        db.create_all()
+        user = User(name="metrics", email="metrics@example.com", password="x")
+        db.session.add(user)
+        db.session.flush()
+        trip = Trip(user_id=user.id, origin_lat=18.0, origin_lng=-76.8, dest_lat=18.1, dest_lng=-76.7,
+                    mode="DRIVING", route_polyline="_p~iF~ps|U", eta_sec=600, distance_m=3500)
+        db.session.add(trip)
+        db.session.commit()
+        headers = {"Authorization": f"Bearer {generate_token(user)}"}
+        url = f"/api/v1/trip/{trip.id}"
+
+    clients = {name: a.test_client() for name, a in apps.items()}
+    samples = {name: [] for name in clients}
+    for k in range(requests + 20):
+        for name, client in clients.items():
+            t0 = time.perf_counter()
+            res = client.get(url, headers=headers)
+            if k >= 20:   # first few warm the caches
+                samples[name].append(time.perf_counter() - t0)
+            if res.status_code != 200:
+                raise SystemExit(f"GET {url} answered {res.status_code}")
+    return {f"http.trip_get.metrics_{name}": _latencies(s) for name, s in samples.items()}
+
+
+# ---- report / compare ----
+
+def _dist_version(name):
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def environment():
+    import numpy
+    from app.utils.route_signature import HAS_GEOHASH
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=HERE, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        rev = None
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "system": platform.system(),
+        "cpu_count": os.cpu_count(),
+        "numpy": numpy.__version__,
+        "geohash": HAS_GEOHASH,
+        "python_geohash": _dist_version("python-geohash"),
+        "sqlalchemy": _dist_version("SQLAlchemy"),
+        "git": rev,
+    }
+
+
+def compare(current, baseline, tolerance):
+    """Lines for the comparison table and the names that regressed."""
+    lines, regressed = [], []
+    for name, cur in sorted(current["results"].items()):
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            lines.append(f"  {name:<32} {cur['score']:>10.2f} {cur['unit']:<7} (new)")
+            continue
+        ratio = cur["score"] / base["score"] if base["score"] else math.inf
+        flag = "REGRESSED" if ratio > 1 + tolerance else ("faster" if ratio < 1 - tolerance else "ok")
+        if flag == "REGRESSED":
+            regressed.append(name)
+        lines.append(f"  {name:<32} {cur['score']:>10.2f} {cur['unit']:<7} "
+                     f"baseline {base['score']:>10.2f}  x{ratio:5.2f}  {flag}")
+    return lines, regressed
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--quick", action="store_true", help="smaller corpus and fewer rounds")
+    ap.add_argument("--routes", type=int, help="commuter routes in the corpus (default 300, quick 60)")
+    ap.add_argument("--rounds", type=int, help="passes per micro-benchmark (default 7, quick 3)")
+    ap.add_argument("--pings", type=int, help="timed /ping requests (default 1000, quick 200)")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--skip-http", action="store_true")
+    ap.add_argument("--out", default=DEFAULT_OUT, help="where to write the JSON results")
+    ap.add_argument("--compare", nargs="?", const=DEFAULT_BASELINE, metavar="BASELINE",
+                    help="compare against a stored run (default benchmarks/baseline.json)")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before failing")
+    ap.add_argument("--save-baseline", nargs="?", const=DEFAULT_BASELINE, metavar="PATH")
+    args = ap.parse_args(argv)
+
+    n_routes = args.routes or (60 if args.quick else 300)
+    rounds = args.rounds or (3 if args.quick else 7)
+    pings = args.pings or (200 if args.quick else 1000)
+
+    configure_env()
+    t0 = time.perf_counter()
+    city = CityNetwork(seed=args.seed)
+    routes = commuter_routes(city, n_routes, n_corridors=max(4, n_routes // 15), seed=args.seed + 1)
+    results, corpus = run_micro(routes, rounds)
+    if not args.skip_http:
+        results.update(run_http(routes, pings))
+        results.update(run_metrics_overhead(pings))
+
+    report = {
+        "schema": 1,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "env": environment(),
+        "params": {"seed": args.seed, "routes": n_routes, "rounds": rounds, "pings": pings,
+                   "city_size": city.size, **{k: round(v, 1) for k, v in corpus.items()}},
+        "results": results,
+        "wall_s": round(time.perf_counter() - t0, 2),
+    }
+
+    print(f"{n_routes} routes, avg {corpus['avg_points']:.0f} points / {corpus['avg_signature_cells']:.0f} cells")
+    for name, r in sorted(results.items()):
+        extra = f"p95 {r['p95']:.2f}  {r['rps']:.0f} req/s" if "p95" in r else f"median {r['median']:.2f}"
+        print(f"  {name:<32} {r['score']:>10.2f} {r['unit']:<7} {extra}")
+    if "http.trip_get.metrics_on" in results:
+        off, on = results["http.trip_get.metrics_off"]["score"], results["http.trip_get.metrics_on"]["score"]
+        print(f"  /metrics overhead on GET /trip/<id>: {(on - off) * 1000:+.1f} us/req ({on / off - 1:+.1%})")
+
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"results -> {args.out}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"baseline -> {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("params") != report["params"]:
+            print("warning: baseline was taken with different parameters")
+        diff = {k: (baseline.get("env", {}).get(k), v) for k, v in report["env"].items()
+                if k != "git" and baseline.get("env", {}).get(k) != v}
+        if diff:
+            print(f"warning: environment differs from the baseline: {diff}")
+        lines, regressed = compare(report, baseline, args.tolerance)
+        print(f"vs {args.compare} (tolerance {args.tolerance:.0%}):")
+        print("\n".join(lines))
+        if regressed:
+            print(f"regressions: {', '.join(regressed)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -187,3 +187,60 @@ DROP INDEX idx_node_trip_time ON trip_point;
 
 -- 3) (Optional) Recreate the composite index with your preferred name
 CREATE INDEX idx_point_trip_time ON trip_point (trip_id, recorded_at);
+
+
+-- ROUTE CLUSTER: MinHash sketch + LSH band buckets (ROUTE_MATCH_MODE=lsh)
+ALTER TABLE route_cluster
+  ADD COLUMN minhash BLOB NULL;
+
+CREATE TABLE route_cluster_band (
+  cluster_id INT NOT NULL,
+  band SMALLINT NOT NULL,
+  bucket BIGINT NOT NULL,
+  PRIMARY KEY (cluster_id, band),
+  INDEX idx_band_bucket (band, bucket),
+  CONSTRAINT fk_band_cluster FOREIGN KEY (cluster_id) REFERENCES route_cluster(id) ON DELETE CASCADE
+) ENGINE=InnoDB;
+-- then: flask route-cluster backfill-minhash
+
+-- ROUTE CLUSTER: binary signatures (sorted little-endian int64 cells)
+ALTER TABLE route_cluster
+  ADD COLUMN geohashes_bin MEDIUMBLOB NULL,
+  MODIFY geohashes_json JSON NULL;
+-- then: flask route-cluster migrate-signatures        (fills geohashes_bin)
+--       flask route-cluster migrate-signatures --drop-json   (after every worker reads geohashes_bin)
+
+-- ROUTE CLUSTER: dedupe key for concurrent creates of the same route
+ALTER TABLE route_cluster
+  ADD COLUMN sig_digest CHAR(32) NULL;
+-- flask route-cluster migrate-signatures   (fills sig_digest; merge exact duplicates before the next step)
+CREATE UNIQUE INDEX uq_cluster_sig ON route_cluster (origin_hash, dest_hash, sig_digest);
+
+-- ROUTE CLUSTER: per-OD lock rows; creating a cluster locks (origin_hash, dest_hash) first
+CREATE TABLE route_od_lock (
+  origin_hash VARCHAR(24) NOT NULL,
+  dest_hash   VARCHAR(24) NOT NULL,
+  PRIMARY KEY (origin_hash, dest_hash)
+) ENGINE=InnoDB;
+
+-- TRIP PATH ARCHIVE: simplified, compressed path of finished trips (replaces their trip_point rows)
+CREATE TABLE trip_path_archive (
+  trip_id INT NOT NULL PRIMARY KEY,
+  path_blob MEDIUMBLOB NOT NULL,
+  raw_points INT NOT NULL,
+  kept_points INT NOT NULL,
+  tolerance_m FLOAT NOT NULL,
+  first_recorded_at DATETIME NULL,
+  last_recorded_at DATETIME NULL,
+  compacted_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  CONSTRAINT fk_archive_trip FOREIGN KEY (trip_id) REFERENCES trip(id) ON DELETE CASCADE
+) ENGINE=InnoDB;
+-- nightly: flask trip compact --older-than-hours 24
+-- or set TRIP_COMPACT_ON_END=true to compact when /trip/<id>/end is called
+
+-- ETAGS: row change timestamps (microseconds) behind the CRUD views' version tokens
+ALTER TABLE user             ADD COLUMN updated_at DATETIME(6) NULL;
+ALTER TABLE user_information ADD COLUMN updated_at DATETIME(6) NULL;
+ALTER TABLE driver           ADD COLUMN updated_at DATETIME(6) NULL;
+ALTER TABLE user_contact     ADD COLUMN updated_at DATETIME(6) NULL;
+ALTER TABLE trip             ADD COLUMN updated_at DATETIME(6) NULL;